@@ -0,0 +1,262 @@
+import json
+from datetime import datetime
+import pandas as pd
+from storage import TABLES, DAYS
+import streamlit as st
+from database import read_table, append_row, update_record, batch, get_cache
+
+# Indicadores do dashboard guardados na aba AGREGADOS, uma linha por aluno e
+# familia (Metricas em JSON). Cada escrita nas abas de origem recalcula so a
+# familia e o aluno afetados, a partir do cache ja corrigido, e o dashboard
+# le esses numeros em vez de varrer todas as abas.
+# Edicoes feitas direto na planilha chegam ao cache quando as abas de origem
+# sao relidas; a familia guarda um resumo das linhas do aluno em cada aba usada
+# no calculo e so e recalculada quando as linhas dele mudam.
+
+AGGREGATES_SHEET = "AGREGADOS"
+NON_STUDY_SLOTS = ['livre', '', 'almoco', 'jantar', 'sono']
+
+
+def _user_rows(df, username):
+    if df.empty or 'Username' not in df.columns:
+        return pd.DataFrame()
+    return df[df['Username'] == username].copy()
+
+def _numbers(df, columns):
+    # Colunas de schema.SCHEMAS ja chegam tipadas; so as demais sao convertidas
+    for c in columns:
+        if c not in df.columns:
+            df[c] = 0
+        elif not pd.api.types.is_numeric_dtype(df[c]):
+            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+    return df
+
+def _source(sheet_name):
+    return read_table(sheet_name, headers=TABLES[sheet_name])
+
+def compute_questoes(username):
+    df_dia = _user_rows(_source("QUESTOES_DIARIAS"), username)
+    df_hist = _user_rows(_source("QUESTOES_HISTORICO"), username)
+
+    semana = []
+    if not df_dia.empty:
+        df_dia = _numbers(df_dia, ['Meta_Semanal'] + DAYS)
+        df_dia['Total_Atual'] = df_dia[DAYS].sum(axis=1)
+        semana = [[m, int(f), int(t)] for m, f, t in zip(df_dia['Materia'], df_dia['Total_Atual'], df_dia['Meta_Semanal'])]
+
+    por_semana = []
+    por_materia = []
+    if not df_hist.empty:
+        df_hist = _numbers(df_hist, ['Qtd'])
+        por_semana = [[k, int(v)] for k, v in df_hist.groupby('Semana')['Qtd'].sum().items()]
+        por_materia = [[k, int(v)] for k, v in df_hist.groupby('Materia', observed=True)['Qtd'].sum().items()]
+
+    return _questoes_payload(semana, por_semana, por_materia)
+
+def _questoes_payload(semana, por_semana, por_materia):
+    return {
+        'total_semana': sum(r[1] for r in semana),
+        'meta_semana': sum(r[2] for r in semana),
+        'total_historico': sum(r[1] for r in por_semana),
+        'semana': semana,
+        'por_semana': por_semana,
+        'por_materia': por_materia,
+    }
+
+def compute_simulados(username):
+    df = _numbers(_user_rows(_source("SIMULADOS"), username), ['Total'])
+    return {
+        'quantidade': len(df),
+        'media_total': float(df['Total'].mean()) if not df.empty else 0,
+    }
+
+def compute_redacoes(username):
+    df = _numbers(_user_rows(_source("REDACOES"), username), ['Nota_Final'])
+    return {
+        'quantidade': len(df),
+        'media_final': float(df['Nota_Final'].mean()) if not df.empty else 0,
+    }
+
+def compute_conteudos(username):
+    df = _numbers(_user_rows(_source("CONTEUDOS"), username), ['Qtd_Exercicios', 'Qtd_Acertos'])
+    por_materia = []
+    if not df.empty:
+        grp = df.groupby('Materia', observed=True).agg(Topicos=('Materia', 'size'), Exercicios=('Qtd_Exercicios', 'sum'), Acertos=('Qtd_Acertos', 'sum'))
+        por_materia = [[m, int(r.Topicos), int(r.Exercicios), int(r.Acertos)] for m, r in grp.iterrows()]
+
+    exercicios = sum(r[2] for r in por_materia)
+    acertos = sum(r[3] for r in por_materia)
+    return {
+        'topicos': len(df),
+        'exercicios': exercicios,
+        'acertos': acertos,
+        'taxa_acerto': acertos / exercicios * 100 if exercicios > 0 else 0,
+        'por_materia': por_materia,
+    }
+
+def compute_horario(username):
+    df = _user_rows(_source("HORARIO"), username)
+    slots = []
+    if not df.empty:
+        values = pd.Series(df[[d for d in DAYS if d in df.columns]].to_numpy().ravel())
+        values = values[values.notna() & (values != '')]
+        values = values[~values.astype(str).str.lower().isin(NON_STUDY_SLOTS)]
+        slots = [[k, int(v)] for k, v in values.value_counts().items()]
+    return {'horas': slots}
+
+FAMILIES = {
+    'questoes': compute_questoes,
+    'simulados': compute_simulados,
+    'redacoes': compute_redacoes,
+    'conteudos': compute_conteudos,
+    'horario': compute_horario,
+}
+
+FAMILY_SOURCES = {
+    'questoes': ["QUESTOES_DIARIAS", "QUESTOES_HISTORICO"],
+    'simulados': ["SIMULADOS"],
+    'redacoes': ["REDACOES"],
+    'conteudos': ["CONTEUDOS"],
+    'horario': ["HORARIO"],
+}
+
+@st.cache_resource
+def _computed():
+    # (aluno, familia) -> resumo das linhas do aluno nas abas de origem no ultimo calculo
+    return {}
+
+def _load_sources(family):
+    for name in FAMILY_SOURCES[family]:
+        if get_cache().get(name) is None:
+            _source(name)
+
+def _source_digests(family):
+    return [get_cache().digests(name, 'Username') for name in FAMILY_SOURCES[family]]
+
+def _marks(digests, username):
+    return tuple(d.get(username) if d is not None else None for d in digests)
+
+def _is_stale(username, family):
+    # So com as abas de origem ja em memoria: o dashboard nao le abas so para isso
+    if any(get_cache().get(name) is None for name in FAMILY_SOURCES[family]):
+        return False
+    return _computed().get((username, family)) != _marks(_source_digests(family), username)
+
+def _refresh(username, family, stored=None):
+    # Recalcula e so grava se os numeros mudaram
+    _load_sources(family)
+    marks = _marks(_source_digests(family), username)
+    metrics = FAMILIES[family](username)
+    if stored is None or json.loads(json.dumps(metrics)) != stored:
+        _store(username, family, metrics)
+    _computed()[(username, family)] = marks
+    return metrics
+
+def _store(username, family, metrics):
+    # So garante a aba carregada (e criada); o frame nao e usado aqui
+    if get_cache().get(AGGREGATES_SHEET) is None:
+        read_table(AGGREGATES_SHEET, headers=TABLES[AGGREGATES_SHEET])
+    payload = json.dumps(metrics, ensure_ascii=False)
+    stamp = datetime.now().strftime("%d/%m/%Y %H:%M")
+    if not update_record(AGGREGATES_SHEET, (username, family), {'Metricas': payload, 'Atualizado': stamp}):
+        append_row(AGGREGATES_SHEET, [username, family, payload, stamp])
+
+def refresh_aggregates(username, *families):
+    # Chamado pelas views logo depois de escrever, no mesmo lote da escrita
+    with batch():
+        for family in families or FAMILIES:
+            _refresh(username, family)
+
+def refresh_questoes(students):
+    # Mesmo calculo de compute_questoes para varios alunos de uma vez
+    # (fechamento da semana): uma passada por aba em vez de filtrar as abas
+    # inteiras aluno por aluno
+    semana, por_semana, por_materia = {}, {}, {}
+    _load_sources('questoes')
+    digests = _source_digests('questoes')
+
+    df_dia = _source("QUESTOES_DIARIAS")
+    if _has(df_dia, ['Materia']):
+        df_dia = _numbers(df_dia, ['Meta_Semanal'] + DAYS)
+        totals = df_dia[DAYS].sum(axis=1)
+        for u, m, f, t in zip(df_dia['Username'], df_dia['Materia'], totals, df_dia['Meta_Semanal']):
+            semana.setdefault(u, []).append([m, int(f), int(t)])
+
+    df_hist = _source("QUESTOES_HISTORICO")
+    if _has(df_hist, ['Semana', 'Materia']):
+        df_hist = _numbers(df_hist, ['Qtd'])
+        for (u, k), v in df_hist.groupby(['Username', 'Semana'], observed=True)['Qtd'].sum().items():
+            por_semana.setdefault(u, []).append([k, int(v)])
+        for (u, k), v in df_hist.groupby(['Username', 'Materia'], observed=True)['Qtd'].sum().items():
+            por_materia.setdefault(u, []).append([k, int(v)])
+
+    with batch():
+        for username in students:
+            metrics = _questoes_payload(semana.get(username, []), por_semana.get(username, []), por_materia.get(username, []))
+            _store(username, 'questoes', metrics)
+            _computed()[(username, 'questoes')] = _marks(digests, username)
+
+def get_aggregates(username):
+    df = _user_rows(read_table(AGGREGATES_SHEET, headers=TABLES[AGGREGATES_SHEET]), username)
+    aggregates = {}
+    for family, payload in zip(df.get('Familia', []), df.get('Metricas', [])):
+        try:
+            aggregates[family] = json.loads(payload)
+        except ValueError:
+            pass
+
+    # Alunos que ainda nao tinham linha (dados anteriores a aba AGREGADOS) e
+    # familias cujas abas de origem mudaram fora do app
+    stale = [f for f in FAMILIES if f not in aggregates or _is_stale(username, f)]
+    if stale:
+        with batch():
+            for family in stale:
+                aggregates[family] = _refresh(username, family, aggregates.get(family))
+    return aggregates
+
+# VISAO DA TURMA
+# Indicadores de todos os alunos de uma vez: um groupby('Username') por aba
+# sobre os frames ja carregados, sem passar aluno por aluno.
+
+COHORT_SHEETS = ["QUESTOES_DIARIAS", "QUESTOES_HISTORICO", "SIMULADOS", "REDACOES", "CONTEUDOS"]
+
+
+def _has(df, columns):
+    return not df.empty and all(c in df.columns for c in ['Username'] + columns)
+
+def compute_cohort(tables, students):
+    cohort = pd.DataFrame(index=pd.Index(students, name='Username'))
+
+    dia = tables.get("QUESTOES_DIARIAS", pd.DataFrame())
+    days = [d for d in DAYS if d in dia.columns]
+    if _has(dia, ['Meta_Semanal']) and days:
+        semana = dia.assign(Feito=dia[days].sum(axis=1)).groupby('Username', observed=True)[['Feito', 'Meta_Semanal']].sum()
+        cohort = cohort.join(semana.rename(columns={'Feito': 'Semana', 'Meta_Semanal': 'Meta'}))
+
+    hist = tables.get("QUESTOES_HISTORICO", pd.DataFrame())
+    if _has(hist, ['Qtd']):
+        cohort = cohort.join(hist.groupby('Username', observed=True)['Qtd'].sum().rename('Historico'))
+
+    sim = tables.get("SIMULADOS", pd.DataFrame())
+    if _has(sim, ['Total']):
+        cohort = cohort.join(sim.groupby('Username', observed=True)['Total'].agg(Simulados='size', Media_Simulados='mean'))
+
+    red = tables.get("REDACOES", pd.DataFrame())
+    if _has(red, ['Nota_Final']):
+        cohort = cohort.join(red.groupby('Username', observed=True)['Nota_Final'].agg(Redacoes='size', Media_Redacao='mean'))
+
+    cont = tables.get("CONTEUDOS", pd.DataFrame())
+    if _has(cont, ['Qtd_Exercicios', 'Qtd_Acertos', 'Status_Estudado']):
+        cohort = cohort.join(cont.groupby('Username', observed=True).agg(
+            Topicos=('Status_Estudado', 'size'), Estudados=('Status_Estudado', 'sum'),
+            Exercicios=('Qtd_Exercicios', 'sum'), Acertos=('Qtd_Acertos', 'sum')))
+
+    for c in ['Semana', 'Meta', 'Historico', 'Simulados', 'Media_Simulados', 'Redacoes', 'Media_Redacao',
+              'Topicos', 'Estudados', 'Exercicios', 'Acertos']:
+        cohort[c] = cohort[c].fillna(0) if c in cohort.columns else 0
+
+    cohort['Questoes'] = cohort['Historico'] + cohort['Semana']
+    cohort['Progresso_Meta'] = (cohort['Semana'] / cohort['Meta'].where(cohort['Meta'] > 0) * 100).fillna(0)
+    cohort['Taxa_Acerto'] = (cohort['Acertos'] / cohort['Exercicios'].where(cohort['Exercicios'] > 0) * 100).fillna(0)
+    cohort['Cobertura'] = (cohort['Estudados'] / cohort['Topicos'].where(cohort['Topicos'] > 0) * 100).fillna(0)
+    return cohort.reset_index()
@@ -0,0 +1,77 @@
+import hashlib
+import hmac
+import os
+import threading
+import streamlit as st
+from database import read_table, get_cache, get_version, update_record
+
+HASH_ALGORITHM = 'pbkdf2_sha256'
+HASH_ITERATIONS = 100_000
+
+
+def hash_password(password, salt=None, iterations=HASH_ITERATIONS):
+    salt = salt or os.urandom(16).hex()
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+    return f"{HASH_ALGORITHM}${iterations}${salt}${digest}"
+
+def is_hashed(stored):
+    return str(stored).startswith(HASH_ALGORITHM + '$')
+
+def check_password(password, stored):
+    stored = str(stored)
+    if is_hashed(stored):
+        _, iterations, salt, _ = stored.split('$', 3)
+        candidate = hash_password(password, salt=salt, iterations=int(iterations))
+        return hmac.compare_digest(candidate.encode(), stored.encode())
+    # Senhas antigas, ainda em texto puro na planilha
+    return hmac.compare_digest(password.encode(), stored.encode())
+
+# Hash descartavel para usuarios inexistentes: o tempo de resposta nao
+# revela se o username existe
+_DUMMY_HASH = hash_password('', salt='0' * 32)
+
+@st.cache_resource
+def _login_index():
+    return {'version': None, 'users': {}, 'students': [], 'lock': threading.Lock()}
+
+def get_login_index():
+    # Username -> dados do usuario, reconstruido so quando a aba LOGIN muda
+    # (cadastro/remocao pelo app ou recarga apos o TTL)
+    if get_cache().get("LOGIN") is None:
+        read_table("LOGIN")
+
+    index = _login_index()
+    version = get_version("LOGIN")
+    with index['lock']:
+        if index['version'] != version:
+            df = read_table("LOGIN")
+            users = {}
+            if not df.empty and 'Username' in df.columns:
+                for record in df.to_dict('records'):
+                    users.setdefault(record['Username'], record)
+            index['users'] = users
+            index['students'] = [u for u, r in users.items() if r.get('Tipo') == 'Aluno']
+            index['version'] = version
+    return index
+
+def find_user(username):
+    return get_login_index()['users'].get(username)
+
+def list_students():
+    return list(get_login_index()['students'])
+
+def authenticate(username, password):
+    user = find_user(username)
+    if user is None:
+        check_password(password, _DUMMY_HASH)
+        return None
+    if not check_password(password, user.get('Senha', '')):
+        return None
+
+    if not is_hashed(user.get('Senha', '')):
+        try:
+            update_record("LOGIN", (username,), {'Senha': hash_password(password)})
+        except Exception:
+            # Migracao do hash fica para o proximo login
+            pass
+    return user
@@ -0,0 +1,80 @@
+import json
+import threading
+import time
+from storage import StorageBackend
+
+
+def payload_size(values):
+    # Tamanho aproximado da resposta JSON da API para esses valores
+    return len(json.dumps(values, ensure_ascii=False).encode())
+
+class CountingBackend(StorageBackend):
+    # Repassa tudo para outro backend contando chamadas "de rede" e bytes
+    # lidos. latency simula o tempo de ida e volta de cada chamada ao Sheets.
+    def __init__(self, inner, latency=0.0):
+        self.inner = inner
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.reads = 0
+            self.writes = 0
+            self.bytes_read = 0
+
+    def stats(self):
+        with self._lock:
+            return {'reads': self.reads, 'writes': self.writes, 'bytes_read': self.bytes_read}
+
+    def _call(self, kind):
+        with self._lock:
+            if kind == 'read':
+                self.reads += 1
+            else:
+                self.writes += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def has_table(self, name):
+        return self.inner.has_table(name)
+
+    def ensure_table(self, name, headers):
+        self.inner.ensure_table(name, headers)
+
+    def read_values(self, name):
+        self._call('read')
+        values = self.inner.read_values(name)
+        with self._lock:
+            self.bytes_read += payload_size(values)
+        return values
+
+    def read_many(self, names):
+        self._call('read')
+        tables = self.inner.read_many(names)
+        with self._lock:
+            self.bytes_read += sum(payload_size(v) for v in tables.values())
+        return tables
+
+    def read_rows(self, requests):
+        self._call('read')
+        found = self.inner.read_rows(requests)
+        with self._lock:
+            self.bytes_read += sum(payload_size(list(rows.values())) for rows in found.values())
+        return found
+
+    def append_rows(self, name, rows):
+        self._call('write')
+        return self.inner.append_rows(name, rows)
+
+    def update_cells(self, name, cells):
+        self._call('write')
+        return self.inner.update_cells(name, cells)
+
+    def delete_rows(self, name, row):
+        self._call('write')
+        return self.inner.delete_rows(name, row)
+
+    def apply_batch(self, operations):
+        self._call('write')
+        return self.inner.apply_batch(operations)
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Gravacoes sincronas: as escritas entram na conta da view que as fez
+os.environ.setdefault("SEMEAR_OPTIMISTIC", "0")
+
+import streamlit as st
+from streamlit import logger
+from streamlit.testing.v1 import AppTest
+import database
+from storage import SQLiteBackend
+from benchmarks.backend import CountingBackend
+from benchmarks.workbook import generate_workbook, student_name
+
+# Latencia por view: cada load_view roda num AppTest, contra uma planilha
+# sintetica num SQLite em memoria. Para cada tamanho de turma mede:
+#   cold: caches vazios (processo recem-iniciado)
+#   warm: outra sessao abrindo a mesma pagina, com os caches ja cheios
+#   peak: pico de memoria alocada durante a execucao cold (tracemalloc)
+# Uso: python -m benchmarks.run --students 10 100 1000 [--json saida.json]
+
+VIEWS = ['dashboard', 'turma', 'horario', 'simulados', 'questoes', 'metas', 'redacoes', 'revisoes', 'conteudos', 'configuracoes']
+
+SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+import importlib
+importlib.import_module('views.{view}').load_view()
+"""
+
+
+def reset_caches():
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+def run_view(view, student, timeout):
+    at = AppTest.from_string(SCRIPT.format(root=ROOT, view=view), default_timeout=timeout)
+    at.session_state['logged_in'] = True
+    at.session_state['username'] = 'mentor'
+    at.session_state['name'] = 'Mentor'
+    at.session_state['role'] = 'Mentor'
+    at.session_state['target_student'] = student
+    at.run()
+    errors = [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+    return errors[0][:200] if errors else None
+
+def measure(backend, view, student, timeout, cold=True, trace=False):
+    if cold:
+        reset_caches()
+    backend.reset()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    error = run_view(view, student, timeout)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, backend.stats(), peak, error
+
+def bench(students, views, weeks, simulados, topics, latency, timeout):
+    backend = CountingBackend(SQLiteBackend(":memory:"), latency=latency)
+    sizes = generate_workbook(backend.inner, students=students, weeks=weeks, simulados=simulados, topics=topics)
+    database.get_backend = lambda: backend
+    student = student_name(1)
+
+    results = []
+    for view in views:
+        # A primeira execucao tambem grava os agregados do aluno (aba AGREGADOS);
+        # a medida cold seguinte ja encontra a aba pronta
+        measure(backend, view, student, timeout)
+        cold_time, cold_stats, _, error = measure(backend, view, student, timeout)
+        warm_time, warm_stats, _, _ = measure(backend, view, student, timeout, cold=False)
+        _, _, peak, _ = measure(backend, view, student, timeout, trace=True)
+        results.append({
+            'students': students,
+            'view': view,
+            'cold_ms': round(cold_time * 1000, 1),
+            'warm_ms': round(warm_time * 1000, 1),
+            'cold_reads': cold_stats['reads'],
+            'cold_writes': cold_stats['writes'],
+            'cold_bytes': cold_stats['bytes_read'],
+            'warm_reads': warm_stats['reads'],
+            'peak_mb': round(peak / 2 ** 20, 1),
+            'rows': sum(sizes.values()),
+            'error': error,
+        })
+    return results
+
+def print_table(results):
+    header = f"{'alunos':>7} {'view':<14} {'cold ms':>9} {'warm ms':>9} {'leituras':>8} {'escritas':>8} {'KB lidos':>10} {'pico MB':>8}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['students']:>7} {r['view']:<14} {r['cold_ms']:>9} {r['warm_ms']:>9} {r['cold_reads']:>8} "
+              f"{r['cold_writes']:>8} {r['cold_bytes'] / 1024:>10.0f} {r['peak_mb']:>8}" + (f"  ERRO: {r['error']}" if r['error'] else ''))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de latencia por view com uma planilha sintetica")
+    parser.add_argument("--students", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--views", nargs="+", default=VIEWS, choices=VIEWS)
+    parser.add_argument("--weeks", type=int, default=12, help="semanas de QUESTOES_HISTORICO por aluno")
+    parser.add_argument("--simulados", type=int, default=8, help="simulados (e redacoes/revisoes) por aluno")
+    parser.add_argument("--topics", type=int, default=15, help="topicos por materia e parte na trilha de CONTEUDOS")
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos simulados por chamada a API")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+    # Sem os avisos de "No runtime found" / ScriptRunContext do modo sem servidor
+    logger.set_log_level("error")
+
+    results = []
+    for students in args.students:
+        results += bench(students, args.views, args.weeks, args.simulados, args.topics, args.latency, args.timeout)
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import random
+from datetime import date, timedelta
+from storage import TABLES, DAYS
+
+# Planilha "Semear Mentoria" sintetica, com as mesmas abas e colunas de
+# storage.TABLES, gravada em qualquer StorageBackend. Sempre a mesma para a
+# mesma semente.
+
+MATERIAS = ["Matematica", "Fisica", "Quimica", "Biologia", "Historia", "Geografia",
+            "Filosofia", "Sociologia", "Portugues", "Literatura", "Ingles", "Espanhol"]
+FRENTES = ["A", "B"]
+PARTES = ["Parte 1", "Parte 2", "Parte 3"]
+IMPORTANCE = ["Baixa", "Media", "Alta"]
+TIPOS_REVISAO = ["Semanal", "Quinzenal", "Mensal", "Trimestral"]
+HOURS = [f"{h:02d}:00:00" for h in range(6, 24)]
+COLORS = ["#10B981", "#F59E0B", "#3B82F6", "#EF4444", "#8B5CF6", "#EC4899",
+          "#14B8A6", "#F97316", "#6366F1", "#84CC16", "#06B6D4", "#A855F7"]
+START = date(2026, 1, 5)
+
+
+def student_name(i):
+    return f"aluno{i:04d}"
+
+def _flag(rng, p):
+    return 'TRUE' if rng.random() < p else 'FALSE'
+
+def _with_id(row, rng):
+    return row + [f"{rng.getrandbits(48):012x}"]
+
+def trail(username, rng, topics):
+    rows = []
+    for materia in MATERIAS:
+        for parte in PARTES:
+            for t in range(topics):
+                ex = rng.randint(0, 40) if username else 0
+                row = [username, materia, FRENTES[t % 2], parte, f"{materia} {parte} - Topico {t + 1}",
+                       rng.choice(IMPORTANCE), _flag(rng, 0.6) if username else 'FALSE',
+                       _flag(rng, 0.4) if username else 'FALSE', ex, rng.randint(0, ex)]
+                for _ in range(4):
+                    row += [_flag(rng, 0.2) if username else 'FALSE', rng.randint(0, 10) if username else 0]
+                rows.append(row)
+    return rows
+
+def student_rows(username, rng, weeks, simulados, topics):
+    rows = {name: [] for name in TABLES}
+    rows["LOGIN"].append([username, "123", username.capitalize(), "Aluno"])
+
+    for materia, color in zip(MATERIAS, COLORS):
+        rows["MATERIAS"].append([username, materia, color])
+    for hour in HOURS:
+        rows["HORARIO"].append([username, hour] + [rng.choice(MATERIAS + ["Livre"] * 4) for _ in DAYS])
+
+    for materia in MATERIAS:
+        rows["QUESTOES_DIARIAS"].append([username, materia, 50] + [rng.randint(0, 15) for _ in DAYS])
+    for w in range(weeks):
+        label = (START + timedelta(weeks=w)).strftime("Semana %d/%m/%Y")
+        for materia in MATERIAS:
+            rows["QUESTOES_HISTORICO"].append([username, label, materia, rng.randint(0, 80)])
+
+    for k in range(simulados):
+        areas = [rng.randint(10, 45) for _ in range(4)]
+        day = (START + timedelta(days=14 * k)).strftime("%d/%m/%Y")
+        rows["SIMULADOS"].append(_with_id([username, f"Simulado {k + 1}", day] + areas + [rng.randrange(400, 1000, 20), sum(areas)], rng))
+        notas = [rng.randrange(80, 201, 20) for _ in range(5)]
+        rows["REDACOES"].append(_with_id([username, f"Tema {k + 1}"] + notas + [sum(notas)], rng))
+        rows["REVISOES"].append(_with_id([username, day, rng.choice(TIPOS_REVISAO), rng.choice(MATERIAS), rng.randint(5, 40)], rng))
+
+    for m in range(5):
+        rows["METAS"].append(_with_id([username, f"Meta {m + 1}", rng.choice(["Pendente", "Concluida"])], rng))
+
+    rows["CONTEUDOS"] = trail(username, rng, topics)
+    return rows
+
+def generate_workbook(backend, students=10, weeks=12, simulados=8, topics=15, seed=42):
+    rng = random.Random(seed)
+
+    tables = {name: [] for name in TABLES}
+    tables["LOGIN"].append(["mentor", "123", "Mentor", "Mentor"])
+    # Trilha modelo (Username vazio), copiada para alunos novos
+    tables["CONTEUDOS"] += trail("", rng, topics)
+
+    for i in range(1, students + 1):
+        for name, rows in student_rows(student_name(i), rng, weeks, simulados, topics).items():
+            tables[name] += rows
+
+    for name, headers in TABLES.items():
+        backend.ensure_table(name, headers)
+        if tables[name]:
+            backend.append_rows(name, tables[name])
+    return {name: len(rows) for name, rows in tables.items()}
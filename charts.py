@@ -0,0 +1,50 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+from instrumentation import span
+
+FIGURE_CACHE_SIZE = 128
+
+
+def frame_hash(df):
+    digest = hashlib.sha1(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+class FigureCache:
+    # LRU de figuras Plotly prontas, chaveadas pelo conteudo dos dados + grafico.
+    # Compartilhado entre sessoes: as figuras nao podem ser alteradas depois.
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+                return fig
+
+        fig = build()
+        with self._lock:
+            self._figures[key] = fig
+            while len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+        return fig
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+def cached_figure(name, df, build, *spec):
+    # build(df, *spec) so roda quando esse grafico ainda nao foi montado com
+    # exatamente esses dados. O st.plotly_chart ainda serializa a figura a
+    # cada execucao; o ganho e nao reconstrui-la com plotly express.
+    key = (name, frame_hash(df), repr(spec))
+    def timed_build():
+        with span("figure"):
+            return build(df, *spec)
+    return get_figure_cache().get_or_build(key, timed_build)
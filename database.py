@@ -1,26 +1,738 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+import time
+import uuid
 import streamlit as st
 import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
+from storage import SheetsBackend, SQLiteBackend, cell_text, ID_COLUMN, ID_TABLES, KEY_COLUMNS
+from scheduler import SheetsUnavailable
+from schema import apply_schema
+from mirror import DiskMirror
+from instrumentation import get_call_log, current_session, session_scope, span
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+CACHE_TTL = 600
+READ_TIMEOUT = 30
+READ_WORKERS = 4
+READ_ATTEMPTS = 3
+
 
 @st.cache_resource
-def connect_to_sheets():
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+def get_connection():
     credentials = Credentials.from_service_account_info(
         dict(st.secrets["gcp_service_account"]),
-        scopes=scopes
+        scopes=SCOPES
     )
-    client = gspread.authorize(credentials)
-    return client.open("Semear Mentoria")
+    return SheetsBackend(credentials, call_log=get_call_log())
 
-@st.cache_data(ttl=600)
-def fetch_sheet_data(sheet_name):
-    sh = connect_to_sheets()
-    worksheet = sh.worksheet(sheet_name)
-    raw_data = worksheet.get_all_values()
-    
+def _storage_setting(key, default):
+    value = os.environ.get("SEMEAR_" + key.upper())
+    if value:
+        return value
+    try:
+        return st.secrets.get("storage", {}).get(key, default)
+    except Exception:
+        # Sem secrets.toml (testes locais)
+        return default
+
+@st.cache_resource
+def get_backend():
+    # "sheets" (padrao) ou "sqlite", via SEMEAR_BACKEND ou [storage] no secrets.toml
+    kind = _storage_setting("backend", "sheets")
+    if kind == "sqlite":
+        return SQLiteBackend(_storage_setting("sqlite_path", "semear.db"))
+    return get_connection()
+
+@st.cache_resource
+def get_mirror():
+    # Espelho em disco das abas do Sheets; desligado com SEMEAR_MIRROR=0.
+    # O backend sqlite ja e local e nao usa espelho.
+    backend = get_backend()
+    if not isinstance(backend, SheetsBackend):
+        return None
+    if str(_storage_setting("mirror", "1")).lower() in ("0", "false", "no"):
+        return None
+    return DiskMirror(_storage_setting("mirror_path", ".semear_mirror"), backend.modified_marker)
+
+def is_degraded():
+    # Circuito aberto: leituras servidas do cache, escritas recusadas
+    scheduler = getattr(get_backend(), 'scheduler', None)
+    return scheduler is not None and scheduler.is_open()
+
+class SheetCache:
+    # Copia em memoria das abas, compartilhada por todas as sessoes.
+    # Cada escrita feita pelo app corrige a copia e incrementa a versao da aba,
+    # entao as leituras so voltam ao Sheets quando a entrada expira (CACHE_TTL).
+    def __init__(self):
+        self._tables = {}
+        self._versions = {}
+        self._lock = threading.RLock()
+
+    def version(self, name):
+        with self._lock:
+            return self._versions.get(name, 0)
+
+    def get(self, name, stale=False):
+        with self._lock:
+            entry = self._tables.get(name)
+            if entry is None or (not stale and time.time() - entry['loaded_at'] > CACHE_TTL):
+                return None
+            return entry
+
+    def store(self, name, values, version=None):
+        # version: versao da aba antes da leitura. Se uma escrita mexeu na aba
+        # enquanto a leitura estava em andamento, a copia lida ja nao vale e
+        # nao e guardada (None)
+        with self._lock:
+            if version is not None and self._versions.get(name, 0) != version:
+                return None
+            self._versions[name] = self._versions.get(name, 0) + 1
+            entry = {'values': [list(row) for row in values], 'loaded_at': time.time(), 'frame': None, 'index': {}, 'digests': {}}
+            self._tables[name] = entry
+            return entry
+
+    def frame(self, name, stale=False):
+        with self._lock:
+            entry = self.get(name, stale=stale)
+            if entry is None:
+                return None
+            if entry['frame'] is None:
+                # Tipado uma vez por versao da aba; as copias ja saem convertidas
+                with span("frame"):
+                    entry['frame'] = apply_schema(name, values_to_frame(entry['values']))
+            return entry['frame'].copy()
+
+    def find(self, name, columns, key):
+        # Indice (chave -> numero da linha) montado na primeira busca e
+        # mantido pelas escritas seguintes
+        with self._lock:
+            entry = self.get(name)
+            if entry is None:
+                return None
+            index = entry['index'].get(columns)
+            if index is None:
+                index = build_index(entry['values'], columns)
+                entry['index'][columns] = index
+            return index.get(key)
+
+    def digests(self, name, column):
+        # Resumo (valor de column -> hash das suas linhas), ex.: por aluno.
+        # Muda so para quem teve alguma linha alterada, lida ou escrita.
+        with self._lock:
+            entry = self.get(name)
+            if entry is None:
+                return None
+            digests = entry['digests'].get(column)
+            if digests is None:
+                digests = build_digests(entry['values'], column)
+                entry['digests'][column] = digests
+            return digests
+
+    def patch(self, name, func):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            entry = self._tables.get(name)
+            if entry is None:
+                return
+            if func(entry) is False:
+                del self._tables[name]
+                return
+            entry['frame'] = None
+            entry['digests'] = {}
+
+    def invalidate(self, name=None):
+        with self._lock:
+            names = list(self._tables) if name is None else [name]
+            for n in names:
+                self._versions[n] = self._versions.get(n, 0) + 1
+                self._tables.pop(n, None)
+
+@st.cache_resource
+def get_cache():
+    return SheetCache()
+
+def values_to_frame(raw_data):
     if not raw_data:
         return pd.DataFrame()
-        
+
     headers = [h.strip() for h in raw_data[0]]
-    return pd.DataFrame(raw_data[1:], columns=headers)
+    width = len(headers)
+    rows = [row + [''] * (width - len(row)) if len(row) < width else row[:width] for row in raw_data[1:]]
+    return pd.DataFrame(rows, columns=headers)
+
+def build_index(values, columns, first_row=2):
+    index = {}
+    if not values:
+        return index
+
+    header = [h.strip() for h in values[0]]
+    if any(c not in header for c in columns):
+        return index
+
+    positions = [header.index(c) for c in columns]
+    for row_num in range(max(first_row, 2), len(values) + 1):
+        row = values[row_num - 1]
+        key = tuple(row[p] if p < len(row) else '' for p in positions)
+        index.setdefault(key, row_num)
+    return index
+
+def build_digests(values, column):
+    if not values:
+        return {}
+    header = [h.strip() for h in values[0]]
+    if column not in header:
+        return {}
+
+    pos = header.index(column)
+    groups = {}
+    for row in values[1:]:
+        groups.setdefault(row[pos] if pos < len(row) else '', []).append(tuple(row))
+    return {value: hash(tuple(rows)) for value, rows in groups.items()}
+
+def _load(sheet_name, values, version=None, degraded=False):
+    # degraded: copia antiga servida com o Sheets fora do ar; sem escritas
+    cache = get_cache()
+    if cache.store(sheet_name, values, version) is None:
+        return None
+    if sheet_name in ID_TABLES and not degraded:
+        _ensure_ids(sheet_name)
+    return cache.frame(sheet_name)
+
+def _mirror_load(sheet_name, stale=False):
+    mirror = get_mirror()
+    return mirror.load(sheet_name, stale=stale) if mirror is not None else None
+
+def _mirror_marker():
+    mirror = get_mirror()
+    return mirror.marker() if mirror is not None else None
+
+def _mirror_save(sheet_name, values, marker):
+    mirror = get_mirror()
+    if mirror is not None:
+        mirror.save(sheet_name, values, marker)
+
+def read_table(sheet_name, headers=None):
+    cache = get_cache()
+    df = cache.frame(sheet_name)
+    if df is not None:
+        return df
+
+    for _ in range(READ_ATTEMPTS):
+        df = _read_fresh(sheet_name, headers, cache.version(sheet_name))
+        if df is not None:
+            return df
+    # A aba continua sendo alterada durante as leituras: le segurando o lock
+    # de escrita, sem nenhum lote novo no meio
+    with _write_lock:
+        return _read_fresh(sheet_name, headers)
+
+def _read_fresh(sheet_name, headers, version=None):
+    # None se a aba mudou (escrita do app) durante a leitura
+    cache = get_cache()
+    wait_for_writes()
+    values = _mirror_load(sheet_name)
+    if values is not None:
+        return _load(sheet_name, values, version)
+
+    backend = get_backend()
+    marker = _mirror_marker()
+    try:
+        with span("io"):
+            if headers is not None:
+                backend.ensure_table(sheet_name, headers)
+            values = backend.read_values(sheet_name)
+    except SheetsUnavailable:
+        # Sheets fora do ar ou sem cota: usa a ultima copia, mesmo expirada
+        df = cache.frame(sheet_name, stale=True)
+        if df is not None:
+            return df
+        values = _mirror_load(sheet_name, stale=True)
+        if values is None:
+            raise
+        return _load(sheet_name, values, version, degraded=True)
+    _mirror_save(sheet_name, values, marker)
+    return _load(sheet_name, values, version)
+
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="semear-read")
+
+def _read_in_session(session, sheet_name, headers):
+    # Chamadas do pool contam para a sessao que pediu a leitura
+    with session_scope(session):
+        return read_table(sheet_name, headers)
+
+def read_tables(sheet_names, headers=None, timeout=READ_TIMEOUT):
+    # Le abas independentes em paralelo, num pool limitado: a pagina espera a
+    # aba mais lenta e nao a soma de todas. Aba que passar do prazo usa a
+    # ultima copia em cache; sem copia, erro.
+    headers = headers or {}
+    cache = get_cache()
+    get_backend()
+
+    tables = {}
+    futures = {}
+    for name in sheet_names:
+        df = cache.frame(name)
+        if df is not None:
+            tables[name] = df
+        else:
+            futures[name] = get_executor().submit(_read_in_session, current_session(), name, headers.get(name))
+
+    deadline = time.monotonic() + timeout
+    for name, future in futures.items():
+        try:
+            tables[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeout:
+            df = cache.frame(name, stale=True)
+            if df is None:
+                raise TimeoutError(f"Tempo esgotado ao ler a aba {name}")
+            tables[name] = df
+    return tables
+
+def fetch_sheet_data(sheet_name):
+    return read_table(sheet_name)
+
+def get_version(sheet_name):
+    return get_cache().version(sheet_name)
+
+def invalidate(sheet_name=None):
+    get_cache().invalidate(sheet_name)
+
+def fetch_snapshot(sheet_names, fresh=()):
+    # Le varias abas de uma vez (no Sheets, uma unica chamada values:batchGet).
+    # Abas ja em cache nao sao relidas; abas inexistentes voltam vazias.
+    # As abas em fresh vem sempre do backend, sem cache nem espelho.
+    cache = get_cache()
+    snapshot = {}
+    missing = []
+
+    for name in fresh:
+        cache.invalidate(name)
+    for name in sheet_names:
+        df = cache.frame(name)
+        if df is None:
+            missing.append(name)
+        else:
+            snapshot[name] = df
+
+    versions = {name: cache.version(name) for name in missing}
+    if missing:
+        wait_for_writes()
+        for name in [n for n in missing if n not in fresh]:
+            values = _mirror_load(name)
+            if values is not None:
+                snapshot[name] = _load(name, values, versions[name])
+                missing.remove(name)
+
+    if missing:
+        marker = _mirror_marker()
+        try:
+            with span("io"):
+                fetched = get_backend().read_many(missing)
+        except SheetsUnavailable:
+            fetched = {}
+            for name in missing:
+                df = cache.frame(name, stale=True)
+                if df is None:
+                    values = _mirror_load(name, stale=True)
+                    if values is None:
+                        raise
+                    df = _load(name, values, versions[name], degraded=True)
+                snapshot[name] = df
+        for name, values in fetched.items():
+            _mirror_save(name, values, marker)
+            snapshot[name] = _load(name, values, versions[name])
+
+    for name in sheet_names:
+        if name in snapshot and snapshot[name] is None:
+            # Alterada durante a leitura em lote: le de novo, so essa aba
+            snapshot[name] = read_table(name)
+
+        snapshot.setdefault(name, pd.DataFrame())
+
+    return snapshot
+
+# ESCRITAS
+# Todas as alteracoes passam por aqui para manter o cache coerente com a planilha.
+# Cada escrita entra num lote (unit of work): o cache e corrigido na hora, para
+# que as buscas seguintes do mesmo lote enxerguem a alteracao, e o lote inteiro
+# vai ao backend numa unica chamada ao final. O lock garante que a linha
+# encontrada no indice ainda e a mesma no momento da escrita.
+
+_write_lock = threading.RLock()
+_local = threading.local()
+
+
+class RowMoved(Exception):
+    pass
+
+
+@contextmanager
+def batch():
+    # Agrupa todas as escritas do bloco. Se o bloco falhar nada e gravado;
+    # st.rerun()/st.stop() dentro do bloco gravam antes de sair.
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+
+    with _write_lock:
+        _local.pending = []
+        commit = False
+        try:
+            yield
+            commit = True
+        except Exception:
+            raise
+        except BaseException:
+            commit = True
+            raise
+        finally:
+            pending, _local.pending = _local.pending, None
+            if commit:
+                _flush(pending)
+            else:
+                _rollback(pending)
+
+def _flush(pending):
+    if not pending:
+        return
+    writer = get_writer()
+    if writer is not None:
+        writer.submit(pending, current_session())
+    else:
+        _apply(pending)
+
+def _apply(pending):
+    writes = [p for p in pending if p[0] != 'check']
+    try:
+        _verify_rows(pending)
+        results = get_backend().apply_batch([(kind, name, payload) for kind, name, payload, _ in writes]) if writes else []
+    except Exception:
+        _rollback(pending)
+        raise
+
+    mirror = get_mirror()
+    if mirror is not None:
+        mirror.forget({name for _, name, _, _ in pending})
+
+    for (kind, name, payload, predicted), result in zip(writes, results):
+        if kind == 'append' and result is not None and result != predicted:
+            invalidate(name)
+
+def _original_row(row, deletes):
+    # Numero da linha antes das exclusoes anteriores do mesmo lote
+    for deleted in reversed(deletes):
+        if row >= deleted:
+            row += 1
+    return row
+
+def _verify_rows(pending):
+    # Confere, com uma unica leitura, que as linhas localizadas pelo indice em
+    # cache ainda tem a mesma chave no backend. Ordenar, inserir ou apagar
+    # linhas direto na planilha muda a numeracao sem passar pelo app.
+    checks = {}
+    deletes = {}
+    touched = set()
+    appended = set()
+    for kind, name, payload, _ in pending:
+        if kind == 'check':
+            row, columns, key = payload
+            row = _original_row(row, deletes.get(name, []))
+            # Linhas ja alteradas ou inseridas neste lote nao existem assim no backend
+            if name in appended or (name, row) in touched or row in checks.get(name, {}):
+                continue
+            checks.setdefault(name, {})[row] = (columns, key)
+        elif kind == 'update':
+            touched |= {(name, _original_row(cell.row, deletes.get(name, []))) for cell in payload}
+        elif kind == 'delete':
+            deletes.setdefault(name, []).append(payload)
+        elif kind == 'append':
+            appended.add(name)
+    if not checks:
+        return
+
+    requests = {}
+    for name, rows in checks.items():
+        columns = [c for cols, _ in rows.values() for c in cols]
+        requests[name] = (sorted(rows), min(columns), max(columns))
+    found = get_backend().read_rows(requests)
+
+    for name, rows in checks.items():
+        first = requests[name][1]
+        for row, (columns, key) in rows.items():
+            cells = found.get(name, {}).get(row, [])
+            current = tuple(cell_text(cells[c - first]) if c - first < len(cells) else '' for c in columns)
+            if current != key:
+                raise RowMoved(f"A aba {name} foi alterada direto na planilha (linha {row}). Recarregue a pagina e tente de novo.")
+
+def _rollback(pending):
+    # O cache ja tinha sido corrigido: descarta as abas tocadas
+    for name in {name for _, name, _, _ in pending}:
+        invalidate(name)
+
+# GRAVACAO EM SEGUNDO PLANO (modo otimista)
+# O lote corrige o cache na hora e a tela ja pode ser redesenhada; o envio ao
+# backend fica numa fila FIFO com uma unica thread, na mesma ordem em que os
+# lotes foram feitos. Se um envio falhar, as abas tocadas sao recarregadas e o
+# erro aparece para a sessao que fez a alteracao.
+
+class BackgroundWriter:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._errors = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="semear-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, pending, owner):
+        self._queue.put((pending, owner))
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    def pop_errors(self, owner):
+        with self._lock:
+            mine = [msg for o, msg in self._errors if o is None or o == owner]
+            self._errors = [(o, msg) for o, msg in self._errors if not (o is None or o == owner)]
+            return mine
+
+    def _report(self, owner, message):
+        with self._lock:
+            self._errors.append((owner, message))
+
+    def _run(self):
+        failed = set()
+        while True:
+            pending, owner = self._queue.get()
+            try:
+                names = {name for _, name, _, _ in pending}
+                if names & failed:
+                    # Lote calculado sobre um estado que nao chegou ao backend
+                    _rollback(pending)
+                    self._report(owner, "Alteracao descartada: uma gravacao anterior na mesma aba falhou.")
+                else:
+                    try:
+                        with session_scope(owner):
+                            _apply(pending)
+                    except Exception as e:
+                        failed |= names
+                        self._report(owner, f"Erro ao salvar: {e}")
+            finally:
+                self._queue.task_done()
+                if not self._queue.unfinished_tasks:
+                    failed.clear()
+
+@st.cache_resource
+def get_writer():
+    # Desligado com SEMEAR_OPTIMISTIC=0 (ou optimistic = "0" no [storage])
+    if str(_storage_setting("optimistic", "1")).lower() in ("0", "false", "no"):
+        return None
+    return BackgroundWriter()
+
+def wait_for_writes(timeout=READ_TIMEOUT):
+    writer = get_writer()
+    return writer.wait(timeout) if writer is not None else True
+
+def pop_write_errors():
+    writer = get_writer()
+    return writer.pop_errors(current_session()) if writer is not None else []
+
+def new_id():
+    return uuid.uuid4().hex[:12]
+
+def _header(sheet_name):
+    entry = get_cache().get(sheet_name)
+    if entry is None:
+        read_table(sheet_name)
+        entry = get_cache().get(sheet_name)
+    if entry is None or not entry['values']:
+        return []
+    return [h.strip() for h in entry['values'][0]]
+
+def _ensure_ids(sheet_name):
+    # Cria a coluna ID (uma unica vez) e preenche linhas sem ID, numa so escrita
+    with _write_lock:
+        entry = get_cache().get(sheet_name)
+        if entry is None or not entry['values']:
+            return
+        values = entry['values']
+        header = [h.strip() for h in values[0]]
+
+        cells = []
+        if ID_COLUMN in header:
+            col = header.index(ID_COLUMN) + 1
+        else:
+            col = len(header) + 1
+            cells.append(gspread.Cell(1, col, ID_COLUMN))
+
+        for row_num in range(2, len(values) + 1):
+            row = values[row_num - 1]
+            if len(row) < col or not row[col - 1]:
+                cells.append(gspread.Cell(row_num, col, new_id()))
+
+        if cells:
+            update_cells(sheet_name, cells)
+
+def _set_cell(values, row, col, value):
+    while len(values) < row:
+        values.append([])
+    line = values[row - 1]
+    while len(line) < col:
+        line.append('')
+    line[col - 1] = cell_text(value)
+
+def _patch_cache(kind, sheet_name, payload, result):
+    def apply(entry):
+        values = entry['values']
+        if kind == 'append':
+            if result != len(values) + 1:
+                return False
+            values.extend([cell_text(v) for v in row] for row in payload)
+            for columns, index in entry['index'].items():
+                for key, row_num in build_index(values, columns, first_row=result).items():
+                    index.setdefault(key, row_num)
+        elif kind == 'update':
+            header = [h.strip() for h in values[0]] if values else []
+            touched = set()
+            for cell in payload:
+                if cell.row == 1 or cell.col > len(header):
+                    touched.add(None)
+                else:
+                    touched.add(header[cell.col - 1])
+                _set_cell(values, cell.row, cell.col, cell.value)
+            if None in touched or any(touched & set(columns) for columns in entry['index']):
+                entry['index'] = {}
+        elif kind == 'delete':
+            if payload > len(values):
+                return False
+            del values[payload - 1]
+            entry['index'] = {}
+
+    get_cache().patch(sheet_name, apply)
+
+def apply_batch(operations):
+    operations = [op for op in operations if op[2]]
+    if not operations:
+        return
+
+    with batch():
+        cache = get_cache()
+        for kind, sheet_name, payload in operations:
+            predicted = None
+            if kind == 'append':
+                entry = cache.get(sheet_name)
+                predicted = len(entry['values']) + 1 if entry is not None else None
+            _patch_cache(kind, sheet_name, payload, predicted)
+            _local.pending.append((kind, sheet_name, payload, predicted))
+
+def _fill_ids(sheet_name, rows):
+    if sheet_name not in ID_TABLES:
+        return rows
+    header = _header(sheet_name)
+    if ID_COLUMN not in header:
+        return rows
+
+    pos = header.index(ID_COLUMN)
+    filled = []
+    for row in rows:
+        row = list(row) + [''] * (pos + 1 - len(row))
+        if not row[pos]:
+            row[pos] = new_id()
+        filled.append(row)
+    return filled
+
+def append_rows(sheet_name, rows):
+    apply_batch([('append', sheet_name, _fill_ids(sheet_name, rows))])
+
+def append_row(sheet_name, row):
+    append_rows(sheet_name, [row])
+
+def update_cells(sheet_name, cells):
+    apply_batch([('update', sheet_name, cells)])
+
+def update_cell(sheet_name, row, col, value):
+    update_cells(sheet_name, [gspread.Cell(row, col, value)])
+
+def update_row(sheet_name, row, values):
+    update_cells(sheet_name, [gspread.Cell(row, i + 1, v) for i, v in enumerate(values)])
+
+def delete_rows(sheet_name, row):
+    apply_batch([('delete', sheet_name, row)])
+
+# ACESSO POR CHAVE
+# key segue KEY_COLUMNS da aba, ex.: ("ana", "Matematica") em QUESTOES_DIARIAS
+
+def find_row(sheet_name, key):
+    cache = get_cache()
+    if cache.get(sheet_name) is None:
+        read_table(sheet_name)
+    return cache.find(sheet_name, KEY_COLUMNS[sheet_name], tuple(cell_text(k) for k in key))
+
+def column_index(sheet_name, column):
+    header = _header(sheet_name)
+    return header.index(column) + 1 if column in header else None
+
+def diff_cells(sheet_name, original, edited, columns):
+    # Celulas alteradas num st.data_editor (frame carregado x frame editado).
+    # A linha de cada registro vem do indice de chaves em cache, sem reler a aba;
+    # os frames precisam ter as colunas de KEY_COLUMNS. Cada linha devolvida ja
+    # fica conferida (check_row): chame no mesmo batch() do update_cells.
+    key_columns = KEY_COLUMNS[sheet_name]
+    before = original.loc[edited.index, columns].map(cell_text).to_numpy()
+    after = edited[columns].map(cell_text).to_numpy()
+
+    cells = []
+    checked = set()
+    for i, j in zip(*(before != after).nonzero()):
+        label = edited.index[i]
+        key = tuple(edited.at[label, c] for c in key_columns)
+        row = find_row(sheet_name, key)
+        col = column_index(sheet_name, columns[j])
+        if row is not None and col is not None:
+            if row not in checked:
+                check_row(sheet_name, row, key)
+                checked.add(row)
+            cells.append(gspread.Cell(row, col, after[i, j]))
+    return cells
+
+def check_row(sheet_name, row, key):
+    # A linha so e gravada se, no backend, ainda tiver essa chave (_verify_rows)
+    columns = tuple(column_index(sheet_name, c) for c in KEY_COLUMNS[sheet_name])
+    if None in columns:
+        return
+    with batch():
+        _local.pending.append(('check', sheet_name, (row, columns, tuple(cell_text(k) for k in key)), None))
+
+def update_record(sheet_name, key, changes):
+    with batch():
+        row = find_row(sheet_name, key)
+        if row is None:
+            return False
+        header = _header(sheet_name)
+        cells = [gspread.Cell(row, header.index(col) + 1, value) for col, value in changes.items() if col in header]
+        check_row(sheet_name, row, key)
+        update_cells(sheet_name, cells)
+        return True
+
+def delete_record(sheet_name, key):
+    with batch():
+        row = find_row(sheet_name, key)
+        if row is None:
+            return False
+        check_row(sheet_name, row, key)
+        delete_rows(sheet_name, row)
+        return True
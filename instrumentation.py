@@ -0,0 +1,252 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import streamlit as st
+from streamlit import logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Registro das chamadas a API do Sheets (uma entrada por chamada, ja contando
+# as retentativas do scheduler): operacao, aba, bytes, latencia e a sessao,
+# execucao (rerun) e view que a disparou. Os reruns de fragmento entram na
+# ultima execucao completa da sessao.
+
+MAX_CALLS = 5000
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_INTERVAL = 15
+SIZE_SAMPLE = 32
+
+_log = logger.get_logger(__name__)
+
+# Sessao dona das chamadas feitas fora da thread do script (pool de leitura,
+# gravacao em segundo plano)
+_session = ContextVar('semear_session', default=None)
+
+
+def current_session():
+    session = _session.get()
+    if session is None:
+        ctx = get_script_run_ctx(suppress_warning=True)
+        session = ctx.session_id if ctx is not None else None
+    return session
+
+@contextmanager
+def session_scope(session):
+    token = _session.set(session)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+def payload_size(value):
+    # Tamanho aproximado em JSON, sem serializar a resposta inteira: listas
+    # longas (linhas de uma aba) sao estimadas por uma amostra de SIZE_SAMPLE
+    # itens vezes o numero de itens
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value) + 2
+    if isinstance(value, (bool, int, float)):
+        return len(str(value))
+    if isinstance(value, dict):
+        return 2 + sum(payload_size(k) + payload_size(v) + 4 for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        n = len(value)
+        if n <= SIZE_SAMPLE:
+            return 2 + sum(payload_size(v) + 2 for v in value)
+        step = n / SIZE_SAMPLE
+        sample = sum(payload_size(value[int(i * step)]) + 2 for i in range(SIZE_SAMPLE))
+        return 2 + int(sample * n / SIZE_SAMPLE)
+    return len(str(value)) + 2
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Histogram:
+    # Histograma acumulado no formato de texto do Prometheus
+    def __init__(self, name, description, label_names, buckets=SPAN_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.setdefault(tuple(labels), {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = ",".join(f'{n}="{_label(v)}"' for n, v in zip(self.label_names, labels))
+                prefix = base + "," if base else ""
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{base}}} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{{{base}}} {series['count']}")
+        return lines
+
+class Metrics:
+    def __init__(self):
+        self.spans = Histogram("semear_span_seconds", "Duracao das etapas de cada execucao (view, io, frame, shape, figure, html)",
+                               ('phase', 'view', 'role'))
+        self.calls = Histogram("semear_sheets_call_seconds", "Latencia das chamadas a API do Sheets, com retentativas",
+                               ('kind', 'op'))
+
+    def render(self):
+        return "\n".join(self.spans.render() + self.calls.render()) + "\n"
+
+@st.cache_resource
+def get_metrics():
+    return Metrics()
+
+class CallLog:
+    def __init__(self, maxlen=MAX_CALLS, metrics=None):
+        self._calls = deque(maxlen=maxlen)
+        self._runs = {}
+        self._lock = threading.Lock()
+        self.metrics = metrics
+
+    def begin_run(self, view=None, role=None):
+        session = current_session()
+        with self._lock:
+            run = self._runs.get(session, {}).get('run', 0) + 1
+            self._runs[session] = {'run': run, 'view': view, 'role': role}
+        return run
+
+    def context(self, session):
+        with self._lock:
+            return dict(self._runs.get(session, {}))
+
+    def set_view(self, view):
+        # View escolhida no menu, conhecida so depois da sidebar
+        session = current_session()
+        with self._lock:
+            self._runs.setdefault(session, {'run': 0})['view'] = view
+
+    def current_run(self, session):
+        with self._lock:
+            return self._runs.get(session, {}).get('run')
+
+    def record(self, kind, operation, table, payload, elapsed, ok):
+        session = current_session()
+        size = payload_size(payload)
+        if self.metrics is not None:
+            self.metrics.calls.observe((kind, operation), elapsed)
+        with self._lock:
+            run = self._runs.get(session, {})
+            self._calls.append({
+                'ts': round(time.time(), 3),
+                'session': session,
+                'run': run.get('run'),
+                'view': run.get('view'),
+                'kind': kind,
+                'op': operation,
+                'table': table,
+                'bytes': size,
+                'ms': round(elapsed * 1000, 1),
+                'ok': ok,
+            })
+
+    def calls(self, session=None, run=None):
+        with self._lock:
+            calls = list(self._calls)
+        if session is not None:
+            calls = [c for c in calls if c['session'] == session]
+        if run is not None:
+            calls = [c for c in calls if c['run'] == run]
+        return calls
+
+    def summary(self, calls, by):
+        groups = {}
+        for c in calls:
+            key = tuple(c[k] for k in by)
+            g = groups.setdefault(key, {'calls': 0, 'bytes': 0, 'ms': 0.0, 'errors': 0})
+            g['calls'] += 1
+            g['bytes'] += c['bytes']
+            g['ms'] += c['ms']
+            g['errors'] += not c['ok']
+        rows = [dict(zip(by, key), **g) for key, g in groups.items()]
+        return sorted(rows, key=lambda r: r['calls'], reverse=True)
+
+    def to_jsonl(self, session=None):
+        return "\n".join(json.dumps(c, ensure_ascii=False) for c in self.calls(session)) + "\n"
+
+@st.cache_resource
+def get_call_log():
+    return CallLog(metrics=get_metrics())
+
+@contextmanager
+def span(phase, view=None, role=None):
+    # Mede um trecho da execucao; view e role vem da execucao atual da sessao
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if view is None or role is None:
+            context = get_call_log().context(current_session())
+            view = context.get('view') if view is None else view
+            role = context.get('role') if role is None else role
+        get_metrics().spans.observe((phase, view or '', role or ''), elapsed)
+
+def _metrics_handler(metrics):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+def _write_metrics(metrics, path, interval):
+    while True:
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                f.write(metrics.render())
+            os.replace(tmp, path)
+        except OSError as e:
+            # Diretorio ausente, disco cheio...: tenta de novo no proximo intervalo
+            _log.error("Metricas nao gravadas em %s: %s", path, e)
+        time.sleep(interval)
+
+@st.cache_resource
+def start_metrics_exporter():
+    # SEMEAR_METRICS_PORT: GET /metrics em 127.0.0.1:<porta>.
+    # SEMEAR_METRICS_FILE: arquivo reescrito a cada METRICS_INTERVAL segundos
+    # (textfile collector do node_exporter). Sem nenhum dos dois, nada e exposto.
+    metrics = get_metrics()
+    port = os.environ.get("SEMEAR_METRICS_PORT")
+    path = os.environ.get("SEMEAR_METRICS_FILE")
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", int(port)), _metrics_handler(metrics))
+        except OSError:
+            # Porta ocupada (outro processo do app ja exporta): segue sem endpoint
+            server = None
+        if server is not None:
+            threading.Thread(target=server.serve_forever, name="semear-metrics", daemon=True).start()
+    if path:
+        threading.Thread(target=_write_metrics, args=(metrics, path, METRICS_INTERVAL), name="semear-metrics-file", daemon=True).start()
+    return metrics
@@ -1,9 +1,12 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-import gspread
-from google.oauth2.service_account import Credentials
 import pandas as pd
-from database import fetch_sheet_data, connect_to_sheets
+from database import is_degraded
+from auth import list_students
+from notifications import show_notifications
+from instrumentation import get_call_log, current_session, span, start_metrics_exporter
+from prefetch import prefetch_student
+from weekly import start_weekly_close
 
 st.set_page_config(
     page_title="Semear Mentoria",
@@ -150,24 +153,12 @@ def local_css():
         """, unsafe_allow_html=True)
 
 local_css()
+start_metrics_exporter()
+start_weekly_close()
 
-@st.cache_data(ttl=300)
 def get_all_students():
     try:
-        scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-        credentials = Credentials.from_service_account_info(
-            dict(st.secrets["gcp_service_account"]),
-            scopes=scopes
-        )
-        client = gspread.authorize(credentials)
-        
-        sh = client.open("Semear Mentoria")
-        worksheet = sh.worksheet("LOGIN")
-        data = worksheet.get_all_records()
-        df = pd.DataFrame(data)
-        
-        students = df[df['Tipo'] == 'Aluno']['Username'].unique().tolist()
-        return students
+        return list_students()
     except Exception as e:
         st.error(f"Erro ao buscar alunos: {e}")
         return []
@@ -179,11 +170,35 @@ if 'logged_in' not in st.session_state:
     st.session_state['role'] = None
     st.session_state['target_student'] = None
 
+def prefetch_selected(student, students=None):
+    # So quando o aluno selecionado muda (ou logo depois do login)
+    if st.session_state.get('prefetched_for') != student:
+        st.session_state['prefetched_for'] = student
+        prefetch_student(student, students)
+
+def api_debug_panel():
+    # Chamadas ao Sheets desta execucao e da sessao (ou de todas), por view e operacao
+    log = get_call_log()
+    session = current_session()
+    with st.expander("Diagnostico de API", expanded=False):
+        all_sessions = st.checkbox("Todas as sessoes", key="api_debug_all")
+        run_calls = log.calls(session, log.current_run(session))
+        calls = log.calls(None if all_sessions else session)
+
+        st.caption(f"Esta execucao: {len(run_calls)} chamadas, {sum(c['bytes'] for c in run_calls) / 1024:.0f} KB, {sum(c['ms'] for c in run_calls):.0f} ms")
+        st.caption(f"{'Todas as sessoes' if all_sessions else 'Sessao'}: {len(calls)} chamadas, {sum(c['bytes'] for c in calls) / 1024:.0f} KB")
+        if calls:
+            st.dataframe(pd.DataFrame(log.summary(calls, ('view', 'op', 'table'))), hide_index=True, use_container_width=True)
+            st.download_button("Exportar JSONL", log.to_jsonl(None if all_sessions else session),
+                               file_name="semear_api_calls.jsonl", mime="application/jsonl", use_container_width=True)
+
 if not st.session_state['logged_in']:
+    get_call_log().begin_run("Login")
     from views import login
     login.load_view()
 
 else:
+    get_call_log().begin_run("Sidebar", st.session_state['role'])
     with st.sidebar:
         st.image("logo.png")
         st.markdown("""
@@ -204,6 +219,7 @@ else:
             if student_list:
                 target = st.selectbox("Aluno Selecionado", student_list, index=index_padrao)
                 st.session_state['target_student'] = target
+                prefetch_selected(target, student_list)
             else:
                 st.warning("Sem alunos cadastrados")
                 st.session_state['target_student'] = None
@@ -212,8 +228,8 @@ else:
             
             selected = option_menu(
                 menu_title="Menu",
-                options=["Dashboard", "Horário", "Simulados", "Questões", "Metas", "Redações", "Revisões", "Conteúdos", "Configurações"],
-                icons=["graph-up", "calendar2-week", "file-text", "pencil", "check-circle", "journal-richtext", "arrow-repeat", "book", "gear"],
+                options=["Dashboard", "Turma", "Horário", "Simulados", "Questões", "Metas", "Redações", "Revisões", "Conteúdos", "Configurações"],
+                icons=["graph-up", "people", "calendar2-week", "file-text", "pencil", "check-circle", "journal-richtext", "arrow-repeat", "book", "gear"],
                 default_index=0,
                 styles={
                     "container": {"border-radius": "8px", "padding": "5!important", "background-color": "rgba(12, 89, 64, 0.15)"},
@@ -232,6 +248,7 @@ else:
 
         else: 
             st.session_state['target_student'] = st.session_state['username']
+            prefetch_selected(st.session_state['username'])
             st.markdown(f"<div style='background: rgba(255,255,255,0.05); padding: 10px; border-radius: 8px; margin-bottom: 20px; border: 1px solid rgba(255,255,255,0.1); text-align: center;'><small>Bem-vindo,</small><br><strong style='color:#10B981; font-size:16px;'>{st.session_state['name']}</strong></div>", unsafe_allow_html=True)
             
             selected = option_menu(
@@ -254,46 +271,63 @@ else:
                 }
             )
         
+        if is_degraded():
+            st.warning("Google Sheets indisponivel: exibindo dados salvos e alteracoes bloqueadas por alguns instantes.")
+
         st.markdown("<div style='margin-top: 50px;'></div>", unsafe_allow_html=True)
         if st.button("Encerrar Sessão", key="logout_btn", use_container_width=True):
             st.session_state['logged_in'] = False
             st.session_state['username'] = None
             st.session_state['role'] = None
             st.session_state['target_student'] = None
+            st.session_state['prefetched_for'] = None
             st.rerun()
 
-    if selected == "Dashboard":
-        from views import dashboard
-        dashboard.load_view()
+    get_call_log().set_view(selected)
+    show_notifications()
+
+    with span("view", view=selected, role=st.session_state['role']):
+        if selected == "Dashboard":
+            from views import dashboard
+            dashboard.load_view()
+
+        elif selected == "Turma":
+            from views import turma
+            turma.load_view()
     
-    elif selected == "Horário":
-        from views import horario
-        horario.load_view()
+        elif selected == "Horário":
+            from views import horario
+            horario.load_view()
         
-    elif selected == "Simulados":
-        from views import simulados
-        simulados.load_view()
+        elif selected == "Simulados":
+            from views import simulados
+            simulados.load_view()
         
-    elif selected == "Questões":
-        from views import questoes
-        questoes.load_view()
+        elif selected == "Questões":
+            from views import questoes
+            questoes.load_view()
         
-    elif selected == "Metas":
-        from views import metas
-        metas.load_view()
+        elif selected == "Metas":
+            from views import metas
+            metas.load_view()
         
-    elif selected == "Redações":
-        from views import redacoes
-        redacoes.load_view()
+        elif selected == "Redações":
+            from views import redacoes
+            redacoes.load_view()
         
-    elif selected == "Revisões":
-        from views import revisoes
-        revisoes.load_view()
+        elif selected == "Revisões":
+            from views import revisoes
+            revisoes.load_view()
         
-    elif selected == "Conteúdos":
-        from views import conteudos
-        conteudos.load_view()
+        elif selected == "Conteúdos":
+            from views import conteudos
+            conteudos.load_view()
         
-    elif selected == "Configurações":
-        from views import configuracoes
-        configuracoes.load_view()
+        elif selected == "Configurações":
+            from views import configuracoes
+            configuracoes.load_view()
+
+    # Depois da view, para incluir as chamadas feitas por ela
+    if st.session_state['role'] == 'Mentor':
+        with st.sidebar:
+            api_debug_panel()
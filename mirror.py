@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Espelho local das abas em parquet (o pyarrow ja vem com o Streamlit).
+# Cada arquivo guarda, junto com os valores, a marca de modificacao da planilha
+# (modifiedTime do Drive) em que foi lido. Um processo novo le a aba do disco
+# se a planilha nao mudou desde entao; se mudou, a aba volta a ser lida do
+# backend e o arquivo e regravado. A marca e consultada no maximo uma vez a
+# cada MARKER_TTL segundos.
+
+MARKER_TTL = 30
+MARKER_KEY = b'semear_marker'
+
+
+def values_to_table(values, marker):
+    width = max((len(row) for row in values), default=0)
+    columns = [[str(row[i]) if i < len(row) else '' for row in values] for i in range(width)]
+    table = pa.table({f"c{i}": pa.array(col, type=pa.string()) for i, col in enumerate(columns)})
+    return table.replace_schema_metadata({MARKER_KEY: marker.encode()})
+
+def table_to_values(table):
+    columns = [table.column(i).to_pylist() for i in range(table.num_columns)]
+    return [list(row) for row in zip(*columns)]
+
+class DiskMirror:
+    def __init__(self, path, marker_func, marker_ttl=MARKER_TTL):
+        self.path = path
+        self.marker_func = marker_func
+        self.marker_ttl = marker_ttl
+        self._marker = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.parquet")
+
+    def marker(self):
+        with self._lock:
+            if self._marker is not None and time.monotonic() - self._checked_at < self.marker_ttl:
+                return self._marker
+        try:
+            marker = str(self.marker_func())
+        except Exception:
+            # Sem marca (Sheets fora do ar): o espelho so serve como copia antiga
+            return None
+        with self._lock:
+            self._marker, self._checked_at = marker, time.monotonic()
+        return marker
+
+    def load(self, name, stale=False):
+        # Valores da aba, ou None se nao houver arquivo ou a planilha mudou
+        path = self._file(name)
+        if not os.path.exists(path):
+            return None
+        marker = None if stale else self.marker()
+        if not stale and marker is None:
+            return None
+        try:
+            if not stale:
+                metadata = pq.read_schema(path).metadata or {}
+                if metadata.get(MARKER_KEY, b'').decode() != marker:
+                    return None
+            return table_to_values(pq.read_table(path))
+        except (OSError, pa.ArrowException):
+            return None
+
+    def save(self, name, values, marker):
+        if marker is None:
+            return
+        tmp = f"{self._file(name)}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            pq.write_table(values_to_table(values, marker), tmp)
+            os.replace(tmp, self._file(name))
+        except (OSError, pa.ArrowException):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def forget(self, names):
+        # Escrita feita pelo app: a marca mudou e os arquivos dessas abas
+        # ficaram para tras
+        with self._lock:
+            self._marker = None
+        for name in names:
+            try:
+                os.remove(self._file(name))
+            except FileNotFoundError:
+                pass
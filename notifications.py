@@ -0,0 +1,22 @@
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+from database import pop_write_errors
+
+
+def notify(message, icon=None):
+    # Toast exibido no proximo rerun (o st.rerun descarta os elementos da execucao atual)
+    st.session_state.setdefault('pending_toasts', []).append((message, icon))
+
+def show_notifications():
+    for message, icon in st.session_state.pop('pending_toasts', []):
+        st.toast(message, icon=icon)
+    for message in pop_write_errors():
+        st.error(message)
+
+def rerun_fragment():
+    # Reexecuta so o fragmento atual (sem main.py, CSS e sidebar). Na execucao
+    # completa da pagina o Streamlit nao aceita scope="fragment".
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
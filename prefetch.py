@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from database import fetch_snapshot, is_degraded
+from aggregates import get_aggregates
+from instrumentation import current_session, session_scope
+
+# Aquece o cache em segundo plano quando um aluno e selecionado (ou faz login):
+# todas as abas que as views usam numa unica leitura em lote, ja convertidas em
+# frames, e os agregados do aluno. Para o mentor, tambem os proximos alunos da
+# lista. A navegacao seguinte le tudo da memoria.
+# Thread propria (e nao o pool de leitura): get_aggregates pode gravar e pegar o
+# lock de escrita, e nao deve ocupar os workers que as views esperam.
+
+PREFETCH_SHEETS = ["HORARIO", "MATERIAS", "SIMULADOS", "QUESTOES_DIARIAS", "QUESTOES_HISTORICO",
+                   "CONTEUDOS", "REVISOES", "REDACOES", "METAS", "AGREGADOS"]
+PREFETCH_AHEAD = 3
+
+
+class Prefetcher:
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="semear-prefetch")
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    def submit(self, students):
+        session = current_session()
+        for student in students:
+            with self._lock:
+                if student in self._queued:
+                    continue
+                self._queued.add(student)
+            self._executor.submit(self._warm, session, student)
+
+    def _warm(self, session, student):
+        try:
+            with session_scope(session):
+                fetch_snapshot(PREFETCH_SHEETS)
+                get_aggregates(student)
+        except Exception:
+            # So otimizacao: se falhar, a view le e mostra o erro normalmente
+            pass
+        finally:
+            with self._lock:
+                self._queued.discard(student)
+
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher()
+
+def prefetch_student(student, students=None):
+    if not student or is_degraded():
+        return
+    targets = [student]
+    if students and student in students:
+        i = students.index(student)
+        targets += students[i + 1:i + 1 + PREFETCH_AHEAD]
+    get_prefetcher().submit(targets)
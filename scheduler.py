@@ -0,0 +1,103 @@
+import random
+import threading
+import time
+from collections import deque
+import requests
+from gspread.exceptions import APIError
+
+# Cota padrao da API do Sheets por usuario (conta de servico) por minuto
+READ_LIMIT = 60
+WRITE_LIMIT = 60
+WINDOW = 60
+
+
+class SheetsUnavailable(Exception):
+    pass
+
+
+def is_retryable(error):
+    if isinstance(error, APIError):
+        code = error.response.status_code
+        return code == 429 or code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+class RequestScheduler:
+    # Controla o uso da cota por minuto (leitura e escrita separadas), segura
+    # as chamadas quando a janela esta cheia, repete 429/5xx com backoff
+    # exponencial + jitter e abre o circuito depois de falhas seguidas.
+    def __init__(self, read_limit=READ_LIMIT, write_limit=WRITE_LIMIT, max_retries=4,
+                 base_delay=1.0, max_delay=16.0, max_wait=20.0, failure_threshold=3, cooldown=30.0):
+        self.limits = {'read': read_limit, 'write': write_limit}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._calls = {'read': deque(), 'write': deque()}
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+
+    def is_open(self):
+        return time.monotonic() < self._open_until
+
+    def usage(self):
+        with self._lock:
+            now = time.monotonic()
+            return {kind: sum(1 for t in calls if now - t < WINDOW) for kind, calls in self._calls.items()}
+
+    def _reserve(self, kind):
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                calls = self._calls[kind]
+                while calls and now - calls[0] >= WINDOW:
+                    calls.popleft()
+                if len(calls) < self.limits[kind]:
+                    calls.append(now)
+                    return
+                wait = WINDOW - (now - calls[0])
+
+            if now + wait > deadline:
+                raise SheetsUnavailable("Limite de requisicoes do Google Sheets atingido. Tente novamente em instantes.")
+            time.sleep(wait)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0.0
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown
+
+    def call(self, kind, func, *args, **kwargs):
+        if self.is_open():
+            raise SheetsUnavailable("Google Sheets indisponivel no momento. Tente novamente em instantes.")
+
+        attempt = 0
+        while True:
+            self._reserve(kind)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                attempt += 1
+                if attempt > self.max_retries:
+                    self._record_failure()
+                    raise SheetsUnavailable(f"Google Sheets indisponivel: {e}") from e
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self._record_success()
+            return result
@@ -0,0 +1,48 @@
+import pandas as pd
+from storage import DAYS
+
+# Tipos das colunas de cada aba, aplicados uma unica vez quando o frame da aba
+# e montado no cache. As views recebem os frames ja tipados e nao repetem o
+# pd.to_numeric a cada execucao. Colunas fora daqui continuam texto.
+#   category: textos que se repetem muito (alunos, materias, tipos)
+#   int16/int32: contagens e notas; celula vazia ou invalida vira 0
+#   bool: checkboxes gravados como TRUE/FALSE
+
+CATEGORY = 'category'
+BOOL = 'bool'
+SCORE = 'int16'
+COUNT = 'int32'
+
+SCHEMAS = {
+    "LOGIN": {'Username': CATEGORY, 'Tipo': CATEGORY},
+    "HORARIO": {'Username': CATEGORY},
+    "MATERIAS": {'Username': CATEGORY, 'Materia': CATEGORY},
+    "SIMULADOS": {'Username': CATEGORY, 'Linguagens': SCORE, 'Humanas': SCORE, 'Natureza': SCORE,
+                  'Matematica': SCORE, 'Redacao': SCORE, 'Total': SCORE},
+    "QUESTOES_DIARIAS": {'Username': CATEGORY, 'Materia': CATEGORY, 'Meta_Semanal': COUNT,
+                         **{day: COUNT for day in DAYS}},
+    "QUESTOES_HISTORICO": {'Username': CATEGORY, 'Materia': CATEGORY, 'Qtd': COUNT},
+    "CONTEUDOS": {'Username': CATEGORY, 'Materia': CATEGORY, 'Frente': CATEGORY, 'Parte': CATEGORY,
+                  'Status_Dado': BOOL, 'Status_Estudado': BOOL, 'Qtd_Exercicios': COUNT, 'Qtd_Acertos': COUNT,
+                  **{f'R{n}_Feita': BOOL for n in range(1, 5)},
+                  **{f'R{n}_Qtd': COUNT for n in range(1, 5)}},
+    "REVISOES": {'Username': CATEGORY, 'Tipo_Revisao': CATEGORY, 'Materia': CATEGORY, 'Qtd_Questoes': COUNT},
+    "REDACOES": {'Username': CATEGORY, 'C1': SCORE, 'C2': SCORE, 'C3': SCORE, 'C4': SCORE, 'C5': SCORE,
+                 'Nota_Final': SCORE},
+    "METAS": {'Username': CATEGORY, 'Status': CATEGORY},
+    "AGREGADOS": {'Username': CATEGORY, 'Familia': CATEGORY},
+}
+
+
+def coerce_column(series, dtype):
+    if dtype == CATEGORY:
+        return series.astype(CATEGORY)
+    if dtype == BOOL:
+        return series.astype(str).str.strip().str.upper() == 'TRUE'
+    return pd.to_numeric(series, errors='coerce').fillna(0).astype(dtype)
+
+def apply_schema(sheet_name, df):
+    for column, dtype in SCHEMAS.get(sheet_name, {}).items():
+        if column in df.columns:
+            df[column] = coerce_column(df[column], dtype)
+    return df
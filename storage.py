@@ -0,0 +1,423 @@
+import numbers
+import sqlite3
+import threading
+import time
+import gspread
+from gspread.utils import rowcol_to_a1
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from scheduler import RequestScheduler
+
+SPREADSHEET_NAME = "Semear Mentoria"
+# Acima disso, read_rows le as colunas inteiras em vez de uma faixa por linha
+ROW_RANGES_LIMIT = 50
+
+ID_COLUMN = 'ID'
+
+DAYS = ['Segunda', 'Terca', 'Quarta', 'Quinta', 'Sexta', 'Sabado', 'Domingo']
+
+TABLES = {
+    "LOGIN": ['Username', 'Senha', 'Nome', 'Tipo'],
+    "HORARIO": ['Username', 'Hora'] + DAYS,
+    "MATERIAS": ['Username', 'Materia', 'Cor'],
+    "SIMULADOS": ['Username', 'Nome_Simulado', 'Data', 'Linguagens', 'Humanas', 'Natureza', 'Matematica', 'Redacao', 'Total', ID_COLUMN],
+    "QUESTOES_DIARIAS": ['Username', 'Materia', 'Meta_Semanal'] + DAYS,
+    "QUESTOES_HISTORICO": ['Username', 'Semana', 'Materia', 'Qtd'],
+    "CONTEUDOS": ['Username', 'Materia', 'Frente', 'Parte', 'Conteudo', 'Importancia', 'Status_Dado', 'Status_Estudado',
+                  'Qtd_Exercicios', 'Qtd_Acertos', 'R1_Feita', 'R1_Qtd', 'R2_Feita', 'R2_Qtd', 'R3_Feita', 'R3_Qtd',
+                  'R4_Feita', 'R4_Qtd'],
+    "REVISOES": ['Username', 'Data', 'Tipo_Revisao', 'Materia', 'Qtd_Questoes', ID_COLUMN],
+    "REDACOES": ['Username', 'Tema', 'C1', 'C2', 'C3', 'C4', 'C5', 'Nota_Final', ID_COLUMN],
+    "METAS": ['Username', 'Descricao', 'Status', ID_COLUMN],
+    "AGREGADOS": ['Username', 'Familia', 'Metricas', 'Atualizado'],
+}
+
+# Chave usada para localizar uma linha sem varrer a aba. As abas sem chave
+# natural usam a coluna ID, preenchida pelo app em cada insercao.
+KEY_COLUMNS = {
+    "LOGIN": ('Username',),
+    "HORARIO": ('Username', 'Hora'),
+    "MATERIAS": ('Username', 'Materia'),
+    "SIMULADOS": ('Username', ID_COLUMN),
+    "QUESTOES_DIARIAS": ('Username', 'Materia'),
+    "CONTEUDOS": ('Username', 'Materia', 'Parte', 'Conteudo'),
+    "REVISOES": ('Username', ID_COLUMN),
+    "REDACOES": ('Username', ID_COLUMN),
+    "METAS": ('Username', ID_COLUMN),
+    "AGREGADOS": ('Username', 'Familia'),
+}
+
+ID_TABLES = [name for name, headers in TABLES.items() if ID_COLUMN in headers]
+
+
+def cell_text(value):
+    # Mesmo texto que o get_all_values devolveria depois da escrita
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def cell_data(value):
+    # Valor no formato CellData da API, com a mesma semantica do RAW do gspread
+    if isinstance(value, bool):
+        return {'userEnteredValue': {'boolValue': value}}
+    if isinstance(value, numbers.Number):
+        return {'userEnteredValue': {'numberValue': float(value)}}
+    return {'userEnteredValue': {'stringValue': cell_text(value)}}
+
+
+class StorageBackend:
+    # Interface comum de persistencia. As abas sao vistas como na planilha:
+    # a linha 1 e o cabecalho e as linhas/colunas sao numeradas a partir de 1.
+    # Operacoes de apply_batch: ('append', aba, linhas), ('update', aba, celulas)
+    # e ('delete', aba, linha); as celulas tem .row, .col e .value (gspread.Cell).
+
+    def has_table(self, name):
+        raise NotImplementedError
+
+    def ensure_table(self, name, headers):
+        raise NotImplementedError
+
+    def read_values(self, name):
+        raise NotImplementedError
+
+    def read_many(self, names):
+        return {name: self.read_values(name) for name in names if self.has_table(name)}
+
+    def read_rows(self, requests):
+        # {aba: (linhas, primeira_coluna, ultima_coluna)} -> {aba: {linha: celulas}}
+        found = {}
+        for name, (rows, first, last) in requests.items():
+            values = self.read_values(name) if self.has_table(name) else []
+            found[name] = {r: values[r - 1][first - 1:last] if r <= len(values) else [] for r in rows}
+        return found
+
+    def modified_marker(self):
+        # Marca que muda a cada alteracao da base (None se o backend nao tiver)
+        return None
+
+    def append_rows(self, name, rows):
+        raise NotImplementedError
+
+    def update_cells(self, name, cells):
+        raise NotImplementedError
+
+    def delete_rows(self, name, row):
+        raise NotImplementedError
+
+    def apply_batch(self, operations):
+        results = []
+        for kind, name, payload in operations:
+            if kind == 'append':
+                results.append(self.append_rows(name, payload))
+            elif kind == 'update':
+                results.append(self.update_cells(name, payload))
+            elif kind == 'delete':
+                results.append(self.delete_rows(name, payload))
+            else:
+                raise ValueError(f"Operacao desconhecida: {kind}")
+        return results
+
+
+def _column_letter(col):
+    return ''.join(ch for ch in rowcol_to_a1(1, col) if ch.isalpha())
+
+def _call_table(func, args):
+    owner = getattr(func, '__self__', None)
+    if isinstance(owner, gspread.Worksheet):
+        return owner.title
+    if args and isinstance(args[0], str):
+        # spreadsheet.worksheet(nome)
+        return args[0]
+    return None
+
+
+class SheetsBackend(StorageBackend):
+    # Cliente autorizado unico por processo. O AuthorizedSession reaproveita as
+    # conexoes HTTP e so renova o token quando ele expira. Toda chamada a API
+    # passa pelo scheduler (cota por minuto, retentativas e circuit breaker) e,
+    # com call_log, fica registrada (instrumentation.CallLog).
+    def __init__(self, credentials, spreadsheet_name=SPREADSHEET_NAME, scheduler=None, call_log=None):
+        self.scheduler = scheduler or RequestScheduler()
+        self.call_log = call_log
+        session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount("https://", adapter)
+
+        self.client = gspread.authorize(credentials, session=session)
+        self.spreadsheet = self._read(self.client.open, spreadsheet_name)
+        self._worksheets = {ws.title: ws for ws in self._read(self.spreadsheet.worksheets)}
+        self._lock = threading.Lock()
+
+    def _read(self, func, *args, **kwargs):
+        return self._call('read', func, *args, **kwargs)
+
+    def _write(self, func, *args, **kwargs):
+        return self._call('write', func, *args, **kwargs)
+
+    def _call(self, kind, func, *args, **kwargs):
+        if self.call_log is None:
+            return self.scheduler.call(kind, func, *args, **kwargs)
+
+        start = time.perf_counter()
+        result, ok = None, False
+        try:
+            result = self.scheduler.call(kind, func, *args, **kwargs)
+            ok = True
+            return result
+        finally:
+            # Leitura: bytes da resposta; escrita: bytes enviados
+            payload = result if kind == 'read' else [args, kwargs]
+            self.call_log.record(kind, func.__name__, _call_table(func, args), payload, time.perf_counter() - start, ok)
+
+    def worksheet(self, name, headers=None):
+        with self._lock:
+            ws = self._worksheets.get(name)
+            if ws is not None:
+                return ws
+
+            try:
+                ws = self._read(self.spreadsheet.worksheet, name)
+            except gspread.WorksheetNotFound:
+                if headers is None:
+                    raise
+                ws = self._write(self.spreadsheet.add_worksheet, title=name, rows=1000, cols=len(headers))
+                self._write(ws.append_row, headers)
+
+            self._worksheets[name] = ws
+            return ws
+
+    def has_table(self, name):
+        return name in self._worksheets
+
+    def ensure_table(self, name, headers):
+        self.worksheet(name, headers=headers)
+
+    def read_values(self, name):
+        return self._read(self.worksheet(name).get_all_values)
+
+    def modified_marker(self):
+        # modifiedTime do arquivo no Drive: muda com qualquer edicao, do app ou manual
+        return self._read(self.spreadsheet.get_lastUpdateTime)
+
+    def read_rows(self, requests):
+        # Todas as linhas numa unica chamada values:batchGet: um intervalo por
+        # linha ou, com muitas linhas, as colunas inteiras
+        ranges = []
+        for name, (rows, first, last) in requests.items():
+            sheet = "'{}'".format(name.replace("'", "''"))
+            if len(rows) > ROW_RANGES_LIMIT:
+                first_col = _column_letter(first)
+                last_col = _column_letter(last)
+                ranges.append((name, None, f"{sheet}!{first_col}:{last_col}"))
+            else:
+                ranges += [(name, r, f"{sheet}!{rowcol_to_a1(r, first)}:{rowcol_to_a1(r, last)}") for r in rows]
+
+        response = self._read(self.spreadsheet.values_batch_get, [r for _, _, r in ranges])
+        found = {name: {} for name in requests}
+        for (name, row, _), vr in zip(ranges, response.get('valueRanges', [])):
+            values = vr.get('values', [])
+            if row is None:
+                found[name].update({r: values[r - 1] if r <= len(values) else [] for r in requests[name][0]})
+            else:
+                found[name][row] = values[0] if values else []
+        return found
+
+    def read_many(self, names):
+        # Uma unica chamada values:batchGet para todas as abas
+        existing = [name for name in names if self.has_table(name)]
+        if not existing:
+            return {}
+
+        ranges = ["'{}'".format(name.replace("'", "''")) for name in existing]
+        response = self._read(self.spreadsheet.values_batch_get, ranges)
+        value_ranges = response.get('valueRanges', [])
+        return {name: vr.get('values', []) for name, vr in zip(existing, value_ranges)}
+
+    def append_rows(self, name, rows):
+        response = self._write(self.worksheet(name).append_rows, rows)
+        updated_range = response.get('updates', {}).get('updatedRange', '')
+        cell_range = updated_range.split('!')[-1]
+        digits = ''.join(ch for ch in cell_range.split(':')[0] if ch.isdigit())
+        return int(digits) if digits else None
+
+    def _fit_columns(self, ws, cells):
+        max_col = max(cell.col for cell in cells)
+        if max_col > ws.col_count:
+            self._write(ws.add_cols, max_col - ws.col_count)
+
+    def update_cells(self, name, cells):
+        ws = self.worksheet(name)
+        self._fit_columns(ws, cells)
+        self._write(ws.update_cells, cells)
+
+    def delete_rows(self, name, row):
+        self._write(self.worksheet(name).delete_rows, row)
+
+    def apply_batch(self, operations):
+        # Todas as operacoes numa unica chamada spreadsheets:batchUpdate, aplicada
+        # em ordem e de forma atomica. appendCells nao informa a linha inserida,
+        # entao o resultado dos appends fica None.
+        requests = []
+        for kind, name, payload in operations:
+            ws = self.worksheet(name)
+            if kind == 'append':
+                requests.append({'appendCells': {
+                    'sheetId': ws.id,
+                    'rows': [{'values': [cell_data(v) for v in row]} for row in payload],
+                    'fields': 'userEnteredValue',
+                }})
+            elif kind == 'update':
+                self._fit_columns(ws, payload)
+                for cell in payload:
+                    requests.append({'updateCells': {
+                        'start': {'sheetId': ws.id, 'rowIndex': cell.row - 1, 'columnIndex': cell.col - 1},
+                        'rows': [{'values': [cell_data(cell.value)]}],
+                        'fields': 'userEnteredValue',
+                    }})
+            elif kind == 'delete':
+                requests.append({'deleteDimension': {
+                    'range': {'sheetId': ws.id, 'dimension': 'ROWS', 'startIndex': payload - 1, 'endIndex': payload},
+                }})
+            else:
+                raise ValueError(f"Operacao desconhecida: {kind}")
+
+        if requests:
+            self._write(self.spreadsheet.batch_update, {'requests': requests})
+        return [None] * len(operations)
+
+
+class SQLiteBackend(StorageBackend):
+    # Mesmas abas e colunas da planilha, uma tabela por aba. A ordem das linhas
+    # segue o rowid, entao a linha N da "planilha" e a (N-1)-esima linha da tabela.
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.RLock()
+        for name, headers in TABLES.items():
+            self.ensure_table(name, headers)
+
+    def _columns(self, name):
+        rows = self._conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+        return [r[1] for r in rows]
+
+    def _rowids(self, name):
+        return [r[0] for r in self._conn.execute(f'SELECT rowid FROM "{name}" ORDER BY rowid')]
+
+    def has_table(self, name):
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+            ).fetchone()
+            return found is not None
+
+    def ensure_table(self, name, headers):
+        with self._lock:
+            cols = ', '.join(f'"{h}" TEXT NOT NULL DEFAULT \'\'' for h in headers)
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({cols})')
+            self._conn.commit()
+
+    def read_values(self, name):
+        with self._lock:
+            headers = self._columns(name)
+            rows = self._conn.execute(f'SELECT * FROM "{name}" ORDER BY rowid').fetchall()
+            return [headers] + [list(r) for r in rows]
+
+    def read_rows(self, requests):
+        found = {}
+        with self._lock:
+            for name, (rows, first, last) in requests.items():
+                found[name] = {r: [] for r in rows}
+                if not self.has_table(name) or not rows:
+                    continue
+                marks = ', '.join('?' * len(rows))
+                query = (f'SELECT * FROM (SELECT ROW_NUMBER() OVER (ORDER BY rowid) + 1 AS n, * FROM "{name}") '
+                         f'WHERE n IN ({marks})')
+                for n, *values in self._conn.execute(query, list(rows)):
+                    found[name][n] = list(values)[first - 1:last]
+        return found
+
+    def _append(self, name, rows):
+        headers = self._columns(name)
+        first_row = len(self._rowids(name)) + 2
+        width = len(headers)
+        placeholders = ', '.join('?' * width)
+        data = []
+        for row in rows:
+            values = [cell_text(v) for v in row][:width]
+            data.append(values + [''] * (width - len(values)))
+        self._conn.executemany(f'INSERT INTO "{name}" VALUES ({placeholders})', data)
+        return first_row
+
+    def _update(self, name, cells):
+        headers = self._columns(name)
+        rowids = self._rowids(name)
+        for cell in sorted(cells, key=lambda c: c.row):
+            if cell.row == 1:
+                # Cabecalho: renomeia ou cria a coluna
+                if cell.col <= len(headers):
+                    self._conn.execute(f'ALTER TABLE "{name}" RENAME COLUMN "{headers[cell.col - 1]}" TO "{cell.value}"')
+                else:
+                    self._conn.execute(f'ALTER TABLE "{name}" ADD COLUMN "{cell.value}" TEXT NOT NULL DEFAULT \'\'')
+                headers = self._columns(name)
+                continue
+
+            while len(rowids) < cell.row - 1:
+                self._conn.execute(f'INSERT INTO "{name}" DEFAULT VALUES')
+                rowids = self._rowids(name)
+            if cell.col > len(headers):
+                continue
+
+            column = headers[cell.col - 1]
+            self._conn.execute(f'UPDATE "{name}" SET "{column}" = ? WHERE rowid = ?',
+                               (cell_text(cell.value), rowids[cell.row - 2]))
+
+    def _delete(self, name, row):
+        rowids = self._rowids(name)
+        if 2 <= row <= len(rowids) + 1:
+            self._conn.execute(f'DELETE FROM "{name}" WHERE rowid = ?', (rowids[row - 2],))
+
+    def append_rows(self, name, rows):
+        return self.apply_batch([('append', name, rows)])[0]
+
+    def update_cells(self, name, cells):
+        return self.apply_batch([('update', name, cells)])[0]
+
+    def delete_rows(self, name, row):
+        return self.apply_batch([('delete', name, row)])[0]
+
+    def apply_batch(self, operations):
+        # Tudo numa unica transacao
+        handlers = {'append': self._append, 'update': self._update, 'delete': self._delete}
+        with self._lock:
+            try:
+                results = []
+                for kind, name, payload in operations:
+                    if kind not in handlers:
+                        raise ValueError(f"Operacao desconhecida: {kind}")
+                    results.append(handlers[kind](name, payload))
+                self._conn.commit()
+                return results
+            except Exception:
+                self._conn.rollback()
+                raise
+
+
+def copy_tables(source, target, names=None):
+    # Copia abas entre backends, por exemplo da planilha para um SQLite local
+    names = list(TABLES) if names is None else names
+    for name, values in source.read_many(names).items():
+        if not values:
+            continue
+        headers = [h.strip() for h in values[0]]
+        if target.has_table(name):
+            current = target.read_values(name)
+            target.apply_batch([('delete', name, row) for row in range(len(current), 1, -1)])
+        target.ensure_table(name, headers)
+        if len(values) > 1:
+            target.append_rows(name, values[1:])
@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+# Gravacao sincrona: os erros de escrita sobem direto para o teste
+os.environ["SEMEAR_OPTIMISTIC"] = "0"
+os.environ["SEMEAR_BACKEND"] = "sqlite"
+os.environ["SEMEAR_SQLITE_PATH"] = ":memory:"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from storage import SQLiteBackend
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = SQLiteBackend(":memory:")
+    monkeypatch.setattr(database, "get_backend", lambda: backend)
+    database.get_cache().invalidate()
+    yield backend
+    database.get_cache().invalidate()
@@ -0,0 +1,46 @@
+import pytest
+import database
+import aggregates
+from database import batch, append_row, invalidate, read_table
+
+
+SIMULADO = ['01/09/2026', 45, 45, 45, 45, 1000, 180]
+
+
+@pytest.fixture
+def computed(backend, monkeypatch):
+    backend.append_rows("SIMULADOS", [['ana', 'ENEM 1'] + SIMULADO + ['s1'], ['bia', 'ENEM 1'] + SIMULADO + ['s2']])
+    aggregates._computed().clear()
+    calls = []
+    compute = aggregates.FAMILIES['simulados']
+    monkeypatch.setitem(aggregates.FAMILIES, 'simulados', lambda username: calls.append(username) or compute(username))
+    for name in aggregates.FAMILY_SOURCES['simulados'] + ["AGREGADOS"]:
+        read_table(name)
+    aggregates.get_aggregates('ana')
+    aggregates.get_aggregates('bia')
+    calls.clear()
+    return calls
+
+
+def test_other_student_write_keeps_aggregates(computed):
+    with batch():
+        append_row("SIMULADOS", ['bia', 'ENEM 2'] + SIMULADO)
+        aggregates.refresh_aggregates('bia', 'simulados')
+    computed.clear()
+    aggregates.get_aggregates('ana')
+    assert aggregates.get_aggregates('bia')['simulados']['quantidade'] == 2
+    assert computed == []
+
+
+def test_reload_recomputes_only_changed_student(backend, computed):
+    invalidate("SIMULADOS")
+    read_table("SIMULADOS")
+    aggregates.get_aggregates('ana')
+    assert computed == []
+
+    backend.append_rows("SIMULADOS", [['ana', 'Externo'] + SIMULADO + ['s3']])
+    invalidate("SIMULADOS")
+    read_table("SIMULADOS")
+    assert aggregates.get_aggregates('ana')['simulados']['quantidade'] == 2
+    aggregates.get_aggregates('bia')
+    assert computed == ['ana']
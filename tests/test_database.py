@@ -0,0 +1,126 @@
+import pytest
+import database
+from database import (batch, read_table, append_row, update_record, delete_record, find_row, get_cache,
+                      RowMoved, BackgroundWriter)
+from storage import ID_COLUMN
+
+
+def _metas(backend):
+    backend.append_rows("METAS", [['ana', 'm1', 'Pendente', 'id1'], ['ana', 'm2', 'Pendente', 'id2'],
+                                  ['bia', 'm3', 'Pendente', 'id3']])
+    return read_table("METAS")
+
+def _status(backend):
+    return {r[3]: r[2] for r in backend.read_values("METAS")[1:]}
+
+
+def test_batch_writes_once_on_exit(backend, monkeypatch):
+    _metas(backend)
+    calls = []
+    apply_batch = backend.apply_batch
+    monkeypatch.setattr(backend, "apply_batch", lambda operations: calls.append(operations) or apply_batch(operations))
+    with batch():
+        update_record("METAS", ('ana', 'id1'), {'Status': 'Concluida'})
+        append_row("METAS", ['bia', 'm4', 'Pendente'])
+        assert calls == []
+        # O cache ja reflete o lote antes do envio
+        assert len(read_table("METAS")) == 4
+    assert len(calls) == 1
+    assert _status(backend)['id1'] == 'Concluida'
+    assert len(backend.read_values("METAS")) == 5
+
+def test_exception_in_batch_discards_writes(backend):
+    _metas(backend)
+    with pytest.raises(ValueError):
+        with batch():
+            update_record("METAS", ('ana', 'id1'), {'Status': 'Concluida'})
+            raise ValueError
+    assert _status(backend)['id1'] == 'Pendente'
+    assert read_table("METAS").set_index(ID_COLUMN).at['id1', 'Status'] == 'Pendente'
+
+def test_failed_flush_rolls_back_cache(backend, monkeypatch):
+    _metas(backend)
+    apply_batch = backend.apply_batch
+
+    def fail(operations):
+        raise RuntimeError("backend fora do ar")
+
+    monkeypatch.setattr(backend, "apply_batch", fail)
+    with pytest.raises(RuntimeError):
+        update_record("METAS", ('ana', 'id1'), {'Status': 'Concluida'})
+    monkeypatch.setattr(backend, "apply_batch", apply_batch)
+    assert get_cache().get("METAS") is None
+    assert read_table("METAS").set_index(ID_COLUMN).at['id1', 'Status'] == 'Pendente'
+
+def test_background_failure_is_reported(backend, monkeypatch):
+    _metas(backend)
+    writer = BackgroundWriter()
+    monkeypatch.setattr(database, "get_writer", lambda: writer)
+    monkeypatch.setattr(backend, "apply_batch", lambda operations: 1 / 0)
+    update_record("METAS", ('ana', 'id1'), {'Status': 'Concluida'})
+    assert database.wait_for_writes(timeout=5)
+    assert len(database.pop_write_errors()) == 1
+    assert get_cache().get("METAS") is None
+
+def test_delete_then_update_in_one_batch(backend):
+    _metas(backend)
+    with batch():
+        assert delete_record("METAS", ('ana', 'id1'))
+        # bia sobe para a linha 3 no cache; a conferencia usa a linha original 4
+        assert find_row("METAS", ('bia', 'id3')) == 3
+        assert update_record("METAS", ('bia', 'id3'), {'Status': 'Concluida'})
+    assert _status(backend) == {'id2': 'Pendente', 'id3': 'Concluida'}
+
+def test_row_moved_outside_app(backend):
+    _metas(backend)
+    backend.delete_rows("METAS", 2)
+    with pytest.raises(RowMoved):
+        update_record("METAS", ('bia', 'id3'), {'Status': 'Concluida'})
+    # Nada gravado por cima da linha errada; depois de reler, funciona
+    assert _status(backend) == {'id2': 'Pendente', 'id3': 'Pendente'}
+    assert update_record("METAS", ('bia', 'id3'), {'Status': 'Concluida'})
+    assert _status(backend)['id3'] == 'Concluida'
+
+def test_verify_rows_reads_once(backend, monkeypatch):
+    _metas(backend)
+    calls = []
+    read_rows = backend.read_rows
+    monkeypatch.setattr(backend, "read_rows", lambda requests: calls.append(requests) or read_rows(requests))
+    with batch():
+        update_record("METAS", ('ana', 'id1'), {'Status': 'Concluida'})
+        update_record("METAS", ('bia', 'id3'), {'Status': 'Concluida'})
+        update_record("METAS", ('bia', 'id3'), {'Descricao': 'm3b'})
+    assert len(calls) == 1
+    assert calls[0]["METAS"][0] == [2, 4]
+
+def test_patch_bumps_version_and_drops_frame(backend):
+    _metas(backend)
+    cache = get_cache()
+    version = cache.version("METAS")
+    read_table("METAS")
+    cache.patch("METAS", lambda entry: entry['values'][1].__setitem__(2, 'Concluida'))
+    assert cache.version("METAS") == version + 1
+    assert cache.get("METAS")['frame'] is None
+    assert read_table("METAS").set_index(ID_COLUMN).at['id1', 'Status'] == 'Concluida'
+
+    # False descarta a entrada
+    cache.patch("METAS", lambda entry: False)
+    assert cache.get("METAS") is None
+
+def test_store_refuses_read_older_than_write(backend):
+    cache = get_cache()
+    version = cache.version("METAS")
+    cache.patch("METAS", lambda entry: None)
+    assert cache.store("METAS", [['Username']], version) is None
+
+def test_ensure_ids_backfills_missing_ids(backend):
+    backend.append_rows("METAS", [['ana', 'm1', 'Pendente', ''], ['bia', 'm2', 'Pendente', 'id2']])
+    df = read_table("METAS")
+    ids = list(df[ID_COLUMN])
+    assert ids[1] == 'id2' and ids[0]
+    assert [r[3] for r in backend.read_values("METAS")[1:]] == ids
+
+def test_degraded_load_skips_id_backfill(backend):
+    backend.append_rows("METAS", [['ana', 'm1', 'Pendente', '']])
+    database._load("METAS", backend.read_values("METAS"), degraded=True)
+    assert backend.read_values("METAS")[1][3] == ''
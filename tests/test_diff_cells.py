@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+import database
+from database import batch, diff_cells, update_cells, read_table, RowMoved
+
+
+def _questoes(backend):
+    backend.append_rows("QUESTOES_DIARIAS", [
+        ['ana', 'Matematica', 10, 1, 0, 0, 0, 0, 0, 0],
+        ['ana', 'Fisica', 10, 2, 0, 0, 0, 0, 0, 0],
+        ['bia', 'Quimica', 10, 3, 0, 0, 0, 0, 0, 0],
+    ])
+    return read_table("QUESTOES_DIARIAS")
+
+
+def test_diff_cells_saves_changed_cells(backend):
+    df = _questoes(backend)
+    edited = df.copy()
+    edited.loc[edited['Materia'] == 'Fisica', 'Segunda'] = 5
+    with batch():
+        cells = diff_cells("QUESTOES_DIARIAS", df, edited, ['Segunda'])
+        update_cells("QUESTOES_DIARIAS", cells)
+    assert [(c.row, c.value) for c in cells] == [(3, '5')]
+    assert backend.read_values("QUESTOES_DIARIAS")[2][3] == '5'
+
+
+def test_diff_cells_refuses_row_shifted_outside_app(backend):
+    df = _questoes(backend)
+    edited = df.copy()
+    edited.loc[edited['Username'] == 'bia', 'Segunda'] = 7
+    # Linha apagada direto na planilha: bia sobe da linha 4 para a 3
+    backend.delete_rows("QUESTOES_DIARIAS", 2)
+    with pytest.raises(RowMoved):
+        with batch():
+            cells = diff_cells("QUESTOES_DIARIAS", df, edited, ['Segunda'])
+            update_cells("QUESTOES_DIARIAS", cells)
+    assert [r[3] for r in backend.read_values("QUESTOES_DIARIAS")[1:]] == ['2', '3']
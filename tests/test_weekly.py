@@ -0,0 +1,32 @@
+import weekly
+from aggregates import AGGREGATES_SHEET
+
+LABEL = "Semana 12/10/2026"
+
+
+def _questoes(backend):
+    backend.append_rows("QUESTOES_DIARIAS", [
+        ['ana', 'Matematica', 10, 1, 2, 0, 0, 0, 0, 0],
+        ['bia', 'Fisica', 10, 0, 0, 0, 0, 0, 0, 0],
+    ])
+
+
+def test_close_week_twice_archives_once(backend):
+    _questoes(backend)
+    first = weekly.close_week(LABEL)
+    assert first['closed'] == ['ana'] and first['empty'] == ['bia'] and first['rows'] == 1
+
+    second = weekly.close_week(LABEL)
+    assert second['closed'] == [] and second['skipped'] == ['ana'] and second['rows'] == 0
+    assert [r[:2] for r in backend.read_values("QUESTOES_HISTORICO")[1:]] == [['ana', LABEL]]
+    assert all(v == '0' for r in backend.read_values("QUESTOES_DIARIAS")[1:] for v in r[3:])
+
+
+def test_dry_run_writes_nothing(backend):
+    _questoes(backend)
+    backend._conn.execute(f'DROP TABLE "{AGGREGATES_SHEET}"')
+    result = weekly.close_week(LABEL, dry_run=True)
+    assert result['closed'] == ['ana'] and result['cells'] == 2
+    assert not backend.has_table(AGGREGATES_SHEET)
+    assert len(backend.read_values("QUESTOES_HISTORICO")) == 1
+    assert backend.read_values("QUESTOES_DIARIAS")[1][3:5] == ['1', '2']
@@ -1,17 +1,8 @@
 import streamlit as st
-import pandas as pd
-import gspread
-from time import sleep
-from google.oauth2.service_account import Credentials
+from notifications import notify
+from database import read_table, append_row, delete_record
+from auth import find_user, hash_password
 
-def connect_to_sheets():
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    credentials = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]),
-        scopes=scopes
-    )
-    client = gspread.authorize(credentials)
-    return client.open("Semear Mentoria")
 def load_view():
     st.markdown("<h2 style='color: #10B981;'>Configurações Administrativas</h2>", unsafe_allow_html=True)
     
@@ -20,10 +11,7 @@ def load_view():
         return
 
     try:
-        sh = connect_to_sheets()
-        worksheet = sh.worksheet("LOGIN")
-        data = worksheet.get_all_records()
-        df = pd.DataFrame(data)
+        df = read_table("LOGIN")
     except Exception as e:
         st.error(f"Erro ao carregar dados: {e}")
         return
@@ -42,15 +30,14 @@ def load_view():
         submitted = st.form_submit_button("Cadastrar Usuário", use_container_width=True)
         
         if submitted:
-            if new_user in df['Username'].values:
+            if find_user(new_user) is not None:
                 st.error("Erro: Username já existe.")
             elif not new_user or not new_pass or not new_name:
                 st.error("Erro: Preencha todos os campos.")
             else:
                 try:
-                    worksheet.append_row([new_user, new_pass, new_name, user_type])
-                    st.success(f"Usuário {new_name} cadastrado com sucesso!")
-                    sleep(1)
+                    append_row("LOGIN", [new_user, hash_password(new_pass), new_name, user_type])
+                    notify(f"Usuário {new_name} cadastrado com sucesso!")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao salvar: {e}")
@@ -84,9 +71,8 @@ def load_view():
             
             if st.button("Remover Acesso", key=f"del_user_{index}", use_container_width=True):
                 try:
-                    worksheet.delete_rows(index + 2)
-                    st.success("Usuário removido.")
-                    sleep(1)
+                    delete_record("LOGIN", (row['Username'],))
+                    notify("Usuário removido.")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro: {e}")
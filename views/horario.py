@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from time import sleep
+from notifications import notify, show_notifications, rerun_fragment
+from database import read_table, read_tables, append_row, append_rows, update_cells, update_record, delete_record, column_index, batch, get_version, diff_cells
+from aggregates import refresh_aggregates
+from instrumentation import span
 
 def get_contrast_text_color(hex_color):
     hex_color = hex_color.lstrip('#')
@@ -13,24 +14,11 @@ def get_contrast_text_color(hex_color):
     except:
         return '#FFFFFF'
 
-def connect_to_sheets():
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    credentials = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]),
-        scopes=scopes
-    )
-    client = gspread.authorize(credentials)
-    return client.open("Semear Mentoria")
+MATERIAS_HEADERS = ["Username", "Materia", "Cor"]
 
-def get_or_create_materias_config(sh, username):
-    try:
-        worksheet = sh.worksheet("MATERIAS")
-    except:
-        worksheet = sh.add_worksheet("MATERIAS", rows=100, cols=3)
-        worksheet.append_row(["Username", "Materia", "Cor"])
-    
-    all_records = worksheet.get_all_records()
-    df = pd.DataFrame(all_records)
+def get_or_create_materias_config(username, df=None):
+    if df is None:
+        df = read_table("MATERIAS", headers=MATERIAS_HEADERS)
     
     user_subjects = {}
     
@@ -39,64 +27,46 @@ def get_or_create_materias_config(sh, username):
         for _, row in user_df.iterrows():
             user_subjects[row['Materia']] = row['Cor']
             
-    return user_subjects, worksheet
+    return user_subjects
 
-def add_new_subject(worksheet, username, materia, cor):
+def add_new_subject(username, materia, cor):
     try:
-        records = worksheet.get_all_records()
-        df = pd.DataFrame(records)
+        df = read_table("MATERIAS")
         if not df.empty and 'Username' in df.columns:
             exists = df[(df['Username'] == username) & (df['Materia'] == materia)]
             if not exists.empty:
                 return False, "Materia ja existe"
         
-        worksheet.append_row([username, materia, cor])
+        append_row("MATERIAS", [username, materia, cor])
         return True, "Materia adicionada"
     except Exception as e:
         return False, str(e)
 
-def update_subject_color(worksheet, username, materia, new_color):
+def update_subject_color(username, materia, new_color):
     try:
-        all_values = worksheet.get_all_values()
-        header = all_values[0]
-        try:
-            user_idx = header.index("Username")
-            mat_idx = header.index("Materia")
-            cor_idx = header.index("Cor")
-        except:
+        if column_index("MATERIAS", "Cor") is None:
             return False, "Erro na estrutura da planilha"
 
-        for i, row in enumerate(all_values):
-            if i == 0: continue
-            if len(row) > mat_idx and row[user_idx] == username and row[mat_idx] == materia:
-                worksheet.update_cell(i + 1, cor_idx + 1, new_color)
-                return True, "Cor atualizada"
+        if update_record("MATERIAS", (username, materia), {"Cor": new_color}):
+            return True, "Cor atualizada"
         
         return False, "Materia nao encontrada"
     except Exception as e:
         return False, str(e)
 
-def delete_subject(worksheet, username, materia):
+def delete_subject(username, materia):
     try:
-        all_values = worksheet.get_all_values()
-        header = all_values[0]
-        try:
-            user_idx = header.index("Username")
-            mat_idx = header.index("Materia")
-        except:
+        if column_index("MATERIAS", "Materia") is None:
             return False, "Erro na estrutura da planilha"
 
-        for i, row in enumerate(all_values):
-            if i == 0: continue
-            if len(row) > mat_idx and row[user_idx] == username and row[mat_idx] == materia:
-                worksheet.delete_rows(i + 1)
-                return True, "Materia excluida"
+        if delete_record("MATERIAS", (username, materia)):
+            return True, "Materia excluida"
         
         return False, "Materia nao encontrada"
     except Exception as e:
         return False, str(e)
 
-def init_schedule_if_needed(df, username, worksheet):
+def init_schedule_if_needed(df, username):
     has_user = False
     if not df.empty and 'Username' in df.columns:
         if username in df['Username'].values:
@@ -110,101 +80,100 @@ def init_schedule_if_needed(df, username, worksheet):
             data_to_append.append(row_data)
         
         try:
-            worksheet.append_rows(data_to_append)
-            st.success(f"Horario base criado para {username}")
-            sleep(1)
-            st.rerun()
+            with batch():
+                append_rows("HORARIO", data_to_append)
+                refresh_aggregates(username, "horario")
+            notify(f"Horario base criado para {username}")
+            rerun_fragment()
         except Exception as e:
             st.error(f"Erro ao inicializar: {e}")
 
-def render_schedule_html(df_user, subject_colors):
+PLANNER_HEADER = """
+<style>
+    .planner-grid {
+        display: grid;
+        grid-template-columns: 50px repeat(7, 1fr);
+        gap: 4px;
+        margin-top: 15px;
+        font-family: 'Poppins', sans-serif;
+    }
+    .header-cell {
+        background: rgba(6, 78, 59, 0.8);
+        color: #10B981;
+        padding: 8px;
+        text-align: center;
+        font-weight: 600;
+        font-size: 12px;
+        border-radius: 6px;
+        border: 1px solid rgba(16, 185, 129, 0.2);
+    }
+    .time-cell {
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        color: #6EE7B7;
+        font-size: 10px;
+        font-weight: bold;
+    }
+    .slot-cell {
+        border-radius: 6px;
+        padding: 4px;
+        font-size: 11px;
+        text-align: center;
+        min-height: 40px;
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        transition: all 0.2s ease;
+        border: 1px solid rgba(255, 255, 255, 0.05);
+    }
+    .slot-empty {
+        background: rgba(255, 255, 255, 0.03);
+        color: #A7F3D0;
+        opacity: 0.5;
+        font-style: italic;
+        font-size: 10px;
+    }
+</style>
+<div class="planner-grid">
+    <div class="header-cell" style="background:transparent; border:none;"></div>
+    <div class="header-cell">SEG</div>
+    <div class="header-cell">TER</div>
+    <div class="header-cell">QUA</div>
+    <div class="header-cell">QUI</div>
+    <div class="header-cell">SEX</div>
+    <div class="header-cell">SAB</div>
+    <div class="header-cell">DOM</div>
+"""
+
+def build_schedule_html(df_user, subject_colors):
     days = ['Segunda', 'Terca', 'Quarta', 'Quinta', 'Sexta', 'Sabado', 'Domingo']
-    
-    html = """
-    <style>
-        .planner-grid {
-            display: grid;
-            grid-template-columns: 50px repeat(7, 1fr);
-            gap: 4px;
-            margin-top: 15px;
-            font-family: 'Poppins', sans-serif;
-        }
-        .header-cell {
-            background: rgba(6, 78, 59, 0.8);
-            color: #10B981;
-            padding: 8px;
-            text-align: center;
-            font-weight: 600;
-            font-size: 12px;
-            border-radius: 6px;
-            border: 1px solid rgba(16, 185, 129, 0.2);
-        }
-        .time-cell {
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: #6EE7B7;
-            font-size: 10px;
-            font-weight: bold;
-        }
-        .slot-cell {
-            border-radius: 6px;
-            padding: 4px;
-            font-size: 11px;
-            text-align: center;
-            min-height: 40px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transition: all 0.2s ease;
-            border: 1px solid rgba(255, 255, 255, 0.05);
-        }
-        .slot-empty {
-            background: rgba(255, 255, 255, 0.03);
-            color: #A7F3D0;
-            opacity: 0.5;
-            font-style: italic;
-            font-size: 10px;
-        }
-    </style>
-    <div class="planner-grid">
-        <div class="header-cell" style="background:transparent; border:none;"></div>
-        <div class="header-cell">SEG</div>
-        <div class="header-cell">TER</div>
-        <div class="header-cell">QUA</div>
-        <div class="header-cell">QUI</div>
-        <div class="header-cell">SEX</div>
-        <div class="header-cell">SAB</div>
-        <div class="header-cell">DOM</div>
-    """
-    
-    for index, row in df_user.iterrows():
-        time_str = str(row.get('Hora', ''))[:5]
-        html += f'<div class="time-cell">{time_str}</div>'
-        
-        for day in days:
-            materia = row.get(day, "")
-            is_filled = materia != "Livre" and materia != ""
-            
-            if is_filled:
-                bg_color = subject_colors.get(materia, "rgba(16, 185, 129, 0.15)")
-                
-                text_color = "#ECFDF5"
-                if bg_color.startswith("#"):
-                    text_color = get_contrast_text_color(bg_color)
-                
-                style = f'background-color: {bg_color}; color: {text_color}; font-weight: 500; box-shadow: 0 0 5px {bg_color}40;'
-                css_class = ""
-            else:
-                style = ""
-                css_class = "slot-empty"
-                
-            display_text = materia if materia else "Livre"
-            
-            html += f'<div class="slot-cell {css_class}" style="{style}">{display_text}</div>'
-            
-    html += "</div>"
-    st.markdown(html, unsafe_allow_html=True)
+
+    # Estilo de cada materia calculado uma vez, nao a cada celula
+    def slot_html(materia):
+        if materia == "Livre" or materia == "":
+            return f'<div class="slot-cell slot-empty" style="">{materia or "Livre"}</div>'
+        bg_color = subject_colors.get(materia, "rgba(16, 185, 129, 0.15)")
+        text_color = get_contrast_text_color(bg_color) if bg_color.startswith("#") else "#ECFDF5"
+        style = f'background-color: {bg_color}; color: {text_color}; font-weight: 500; box-shadow: 0 0 5px {bg_color}40;'
+        return f'<div class="slot-cell " style="{style}">{materia}</div>'
+
+    grid = df_user.reindex(columns=days).fillna("").astype(str).to_numpy()
+    times = df_user['Hora'].fillna("").astype(str).str[:5]
+    slots = {value: slot_html(value) for value in set(grid.ravel())}
+
+    body = "".join(f'<div class="time-cell">{t}</div>' + "".join(map(slots.__getitem__, row)) for t, row in zip(times, grid))
+    return PLANNER_HEADER + body + "</div>"
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_schedule_html(username, horario_version, materias_version, _df_user, _subject_colors):
+    # Mesmo HTML enquanto HORARIO e MATERIAS nao mudarem
+    return build_schedule_html(_df_user, _subject_colors)
+
+def render_schedule_html(df_user, subject_colors, username):
+    with span("html"):
+        html = cached_schedule_html(username, get_version("HORARIO"), get_version("MATERIAS"), df_user, subject_colors)
+        st.markdown(html, unsafe_allow_html=True)
 
 def load_view():
     st.markdown("<h2 style='color: #10B981;'>Planejamento Semanal</h2>", unsafe_allow_html=True)
@@ -213,41 +182,41 @@ def load_view():
     if not target_student:
         st.warning("Selecione um aluno.")
         return
-    
+
+    render_horario(target_student)
+
+# O planner e o editor da grade (so mentor) reexecutam apenas este fragmento
+@st.fragment
+def render_horario(target_student):
+    show_notifications()
+
     user_role = str(st.session_state.get('role', '')).lower().strip()
     is_mentor = user_role == 'mentor'
     
     try:
-        sh = connect_to_sheets()
-        
-        ws_horario = sh.worksheet("HORARIO")
-        raw_data = ws_horario.get_all_values()
-        
         days_cols = ['Segunda', 'Terca', 'Quarta', 'Quinta', 'Sexta', 'Sabado', 'Domingo']
         cols = ['Username', 'Hora'] + days_cols
         
-        if not raw_data:
+        tables = read_tables(["HORARIO", "MATERIAS"], headers={"MATERIAS": MATERIAS_HEADERS})
+        df = tables["HORARIO"]
+        
+        if len(df.columns) == 0:
             df = pd.DataFrame(columns=cols)
-            ws_horario.append_row(cols)
+            append_row("HORARIO", cols)
         else:
-            headers = [h.strip() for h in raw_data[0]]
-            df = pd.DataFrame(raw_data[1:], columns=headers)
             for c in cols:
                 if c not in df.columns:
                     df[c] = ""
         
-        init_schedule_if_needed(df, target_student, ws_horario)
+        init_schedule_if_needed(df, target_student)
         
-        raw_data = ws_horario.get_all_values()
-        headers = [h.strip() for h in raw_data[0]]
-        df = pd.DataFrame(raw_data[1:], columns=headers)
-        
-        df_user = df[df['Username'] == target_student].copy()
-        if not df_user.empty:
-            df_user['Hora_Sort'] = pd.to_datetime(df_user['Hora'], format='%H:%M:%S', errors='coerce')
-            df_user = df_user.sort_values('Hora_Sort')
+        with span("shape"):
+            df_user = df[df['Username'] == target_student].copy()
+            if not df_user.empty:
+                df_user['Hora_Sort'] = pd.to_datetime(df_user['Hora'], format='%H:%M:%S', errors='coerce')
+                df_user = df_user.sort_values('Hora_Sort')
 
-        subject_colors, ws_materias = get_or_create_materias_config(sh, target_student)
+        subject_colors = get_or_create_materias_config(target_student, tables["MATERIAS"])
 
     except Exception as e:
         st.error(f"Erro ao conectar ou processar dados: {e}")
@@ -261,7 +230,7 @@ def load_view():
     
     with tabs[0]:
         if not df_user.empty:
-            render_schedule_html(df_user, subject_colors)
+            render_schedule_html(df_user, subject_colors, target_student)
         else:
             st.info("Nenhum horario preenchido.")
             
@@ -281,11 +250,10 @@ def load_view():
                         st.write("")
                         if st.button("Adicionar", use_container_width=True):
                             if new_materia:
-                                success, msg = add_new_subject(ws_materias, target_student, new_materia, new_cor)
+                                success, msg = add_new_subject(target_student, new_materia, new_cor)
                                 if success:
-                                    st.success(msg)
-                                    sleep(1)
-                                    st.rerun()
+                                    notify(msg)
+                                    rerun_fragment()
                                 else:
                                     st.warning(msg)
                             else:
@@ -303,21 +271,19 @@ def load_view():
                             st.write("")
                             st.write("")
                             if st.button("Salvar Cor", use_container_width=True):
-                                s, m = update_subject_color(ws_materias, target_student, materia_sel, edit_cor)
+                                s, m = update_subject_color(target_student, materia_sel, edit_cor)
                                 if s:
-                                    st.success(m)
-                                    sleep(1)
-                                    st.rerun()
+                                    notify(m)
+                                    rerun_fragment()
                                 else:
                                     st.error(m)
                         
                         st.markdown("---")
                         if st.button(f"Excluir {materia_sel}", type="primary", use_container_width=True):
-                            s, m = delete_subject(ws_materias, target_student, materia_sel)
+                            s, m = delete_subject(target_student, materia_sel)
                             if s:
-                                st.success(m)
-                                sleep(1)
-                                st.rerun()
+                                notify(m)
+                                rerun_fragment()
                             else:
                                 st.error(m)
                     else:
@@ -355,34 +321,16 @@ def load_view():
             
             if st.button("Salvar Grade", use_container_width=True):
                 try:
-                    all_values = ws_horario.get_all_values()
-                    headers_sheet = [h.strip() for h in all_values[0]]
-                    col_indices = {name: i for i, name in enumerate(headers_sheet)}
-                    
-                    cells_to_update = []
-                    
-                    sheet_map = {}
-                    for i, row_val in enumerate(all_values):
-                        if i == 0: continue
-                        u = row_val[col_indices['Username']] if len(row_val) > col_indices['Username'] else ""
-                        h = row_val[col_indices['Hora']] if len(row_val) > col_indices['Hora'] else ""
-                        sheet_map[(u, h)] = i + 1
-                    
-                    for idx, row in edited_df.iterrows():
-                        hora = row['Hora']
-                        sheet_row_idx = sheet_map.get((target_student, hora))
-                        
-                        if sheet_row_idx:
-                            for day in days_cols:
-                                new_val = row[day]
-                                col_idx = col_indices[day] + 1
-                                cells_to_update.append(gspread.Cell(sheet_row_idx, col_idx, new_val))
+                    # So as celulas que mudaram no editor
+                    with batch():
+                        cells_to_update = diff_cells("HORARIO", df_editor, edited_df, days_cols)
+                        if cells_to_update:
+                            update_cells("HORARIO", cells_to_update)
+                            refresh_aggregates(target_student, "horario")
                     
                     if cells_to_update:
-                        ws_horario.update_cells(cells_to_update)
-                        st.success("Horario atualizado com sucesso!")
-                        sleep(1)
-                        st.rerun()
+                        notify("Horario atualizado com sucesso!")
+                        rerun_fragment()
                     else:
                         st.warning("Nenhuma alteracao detectada.")
                         
@@ -1,16 +1,5 @@
 import streamlit as st
-import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-
-def connect_to_sheets():
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    credentials = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]),
-        scopes=scopes
-    )
-    client = gspread.authorize(credentials)
-    return client.open("Semear Mentoria")
+from auth import authenticate
 
 st.markdown("""
 <style>
@@ -57,15 +46,9 @@ def load_view():
 
             if submit_button:
                 try:
-                    sh = connect_to_sheets()
-                    worksheet = sh.worksheet("LOGIN")
-                    data = worksheet.get_all_records()
-                    df = pd.DataFrame(data)
-                    
-                    user_match = df[(df['Username'] == username) & (df['Senha'].astype(str) == password)]
+                    user_data = authenticate(username, password)
                     
-                    if not user_match.empty:
-                        user_data = user_match.iloc[0]
+                    if user_data is not None:
                         st.session_state['logged_in'] = True
                         st.session_state['username'] = user_data['Username']
                         st.session_state['name'] = user_data['Nome']
@@ -1,17 +1,7 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from time import sleep
-from google.oauth2.service_account import Credentials
-
-def connect_to_sheets():
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    credentials = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]),
-        scopes=scopes
-    )
-    client = gspread.authorize(credentials)
-    return client.open("Semear Mentoria")
+from notifications import notify, show_notifications, rerun_fragment
+from database import read_table, append_row, update_record, delete_record
 
 def load_view():
     st.markdown("<h2 style='color: #10B981;'>Minhas Metas</h2>", unsafe_allow_html=True)
@@ -21,12 +11,16 @@ def load_view():
     if not target_student:
         st.warning("Selecione um aluno no menu lateral para visualizar ou adicionar metas.")
         return
-    
+
+    render_metas(target_student)
+
+# Concluir/Excluir reexecutam so este bloco, sobre o cache da aba
+@st.fragment
+def render_metas(target_student):
+    show_notifications()
+
     try:
-        sh = connect_to_sheets()
-        worksheet = sh.worksheet("METAS")
-        data = worksheet.get_all_records()
-        df = pd.DataFrame(data)
+        df = read_table("METAS")
     except Exception as e:
         st.error(f"Erro ao carregar dados: {e}")
         return
@@ -40,10 +34,9 @@ def load_view():
             
         if submitted and new_meta:
             try:
-                worksheet.append_row([target_student, new_meta, "Pendente"])
-                st.success("Meta adicionada!")
-                sleep(0.5)
-                st.rerun()
+                append_row("METAS", [target_student, new_meta, "Pendente"])
+                notify("Meta adicionada!")
+                rerun_fragment()
             except Exception as e:
                 st.error(f"Erro: {e}")
 
@@ -60,11 +53,9 @@ def load_view():
         if df_user.empty:
             st.info("Nenhuma meta encontrada para este aluno.")
         else:
-            all_records = worksheet.get_all_records()
-            
-            for i, record in enumerate(all_records):
+            for i, record in df_user.iterrows():
                 if record.get('Username') == target_student:
-                    row_num = i + 2 
+                    record_id = record['ID']
                     desc = record['Descricao']
                     status = record['Status']
                     
@@ -100,13 +91,13 @@ def load_view():
                     c1, c2 = st.columns([3, 1])
                     with c1:
                         btn_label = "Reabrir" if status == "Concluida" else "Concluir"
-                        if st.button(btn_label, key=f"done_{row_num}", use_container_width=True):
+                        if st.button(btn_label, key=f"done_{record_id}", use_container_width=True):
                             new_status = "Pendente" if status == "Concluida" else "Concluida"
-                            worksheet.update_cell(row_num, 3, new_status)
-                            sleep(0.5)
-                            st.rerun()
+                            if update_record("METAS", (target_student, record_id), {'Status': new_status}):
+                                rerun_fragment()
+                            else:
+                                st.error("Erro ao encontrar o registro original.")
                     with c2:
-                        if st.button("Excluir", key=f"del_{row_num}", use_container_width=True):
-                            worksheet.delete_rows(row_num)
-                            sleep(0.5)
-                            st.rerun()
+                        if st.button("Excluir", key=f"del_{record_id}", use_container_width=True):
+                            delete_record("METAS", (target_student, record_id))
+                            rerun_fragment()
@@ -1,29 +1,16 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from time import sleep
+from notifications import notify, show_notifications, rerun_fragment
 import plotly.express as px
-from datetime import datetime
+from database import read_tables, append_row, append_rows, update_cells, batch, diff_cells
+from aggregates import refresh_aggregates
+from charts import cached_figure
+from instrumentation import span
+from weekly import close_week, week_label
 
-def connect_to_sheets():
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    credentials = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]),
-        scopes=scopes
-    )
-    client = gspread.authorize(credentials)
-    return client.open("Semear Mentoria")
-
-def check_history_sheet(sh):
-    try:
-        return sh.worksheet("QUESTOES_HISTORICO")
-    except:
-        ws = sh.add_worksheet(title="QUESTOES_HISTORICO", rows="1000", cols="4")
-        ws.append_row(["Username", "Semana", "Materia", "Qtd"])
-        return ws
+HISTORY_HEADERS = ["Username", "Semana", "Materia", "Qtd"]
 
-def init_questoes_if_needed(df, username, worksheet):
+def init_questoes_if_needed(df, username):
     has_user = False
     if not df.empty and 'Username' in df.columns:
         if username in df['Username'].values:
@@ -41,10 +28,53 @@ def init_questoes_if_needed(df, username, worksheet):
             row = [username, mat, 0, 0, 0, 0, 0, 0, 0, 0]
             data_to_append.append(row)
             
-        worksheet.append_rows(data_to_append)
-        st.success(f"Tabela inicializada para {username}")
-        sleep(1)
-        st.rerun()
+        with batch():
+            append_rows("QUESTOES_DIARIAS", data_to_append)
+            refresh_aggregates(username, "questoes")
+        notify(f"Tabela inicializada para {username}")
+        rerun_fragment()
+
+def weekly_chart(df_melt):
+    fig = px.bar(
+        df_melt, 
+        x='Materia', 
+        y='Qtd', 
+        color='Tipo', 
+        barmode='group',
+        color_discrete_map={'Total_Realizado': '#10B981', 'Meta_Semanal': '#064E3B'},
+        text_auto=True
+    )
+    
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font_color='#ECFDF5',
+        xaxis_title=None,
+        yaxis_title=None,
+        legend_title=None,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig
+
+def history_chart(df_hist_user):
+    fig = px.bar(
+        df_hist_user,
+        x="Semana",
+        y="Qtd",
+        color="Materia",
+        barmode="group",
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+        text_auto=True
+    )
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font_color='#ECFDF5',
+        xaxis_title=None,
+        yaxis_title=None,
+        legend_title=None
+    )
+    return fig
 
 def load_view():
     st.markdown("<h2 style='color: #10B981;'>Controle de Questoes</h2>", unsafe_allow_html=True)
@@ -54,17 +84,22 @@ def load_view():
         st.warning("Selecione um aluno para visualizar.")
         return
 
+    render_questoes(target_student)
+
+# Editar a grade e salvar reexecutam so este fragmento, nao a pagina toda
+@st.fragment
+def render_questoes(target_student):
+    show_notifications()
+
     try:
-        sh = connect_to_sheets()
-        ws_diario = sh.worksheet("QUESTOES_DIARIAS")
-        ws_hist = check_history_sheet(sh)
-        
-        raw_data = ws_diario.get_all_values()
+        tables = read_tables(["QUESTOES_DIARIAS", "QUESTOES_HISTORICO"], headers={"QUESTOES_HISTORICO": HISTORY_HEADERS})
+        df = tables["QUESTOES_DIARIAS"]
+        df_hist = tables["QUESTOES_HISTORICO"]
         cols = ['Username', 'Materia', 'Meta_Semanal', 'Segunda', 'Terca', 'Quarta', 'Quinta', 'Sexta', 'Sabado', 'Domingo']
         
-        if not raw_data:
-            ws_diario.append_row(cols)
-            raw_data = [cols]
+        if len(df.columns) == 0:
+            append_row("QUESTOES_DIARIAS", cols)
+            df = pd.DataFrame(columns=cols)
             
     except Exception as e:
         st.error(f"Erro de conexao com o Google Sheets: {e}")
@@ -73,22 +108,14 @@ def load_view():
     tab_semanal, tab_historico = st.tabs(["Controle Semanal", "Historico Completo"])
 
     try:
-        headers = [h.strip() for h in raw_data[0]]
-        df = pd.DataFrame(raw_data[1:], columns=headers)
-        
         for c in cols:
             if c not in df.columns:
                 df[c] = 0
         
-        init_questoes_if_needed(df, target_student, ws_diario)
-        
-        raw_data = ws_diario.get_all_values()
-        df = pd.DataFrame(raw_data[1:], columns=headers)
+        init_questoes_if_needed(df, target_student)
         
-        df_user = df[df['Username'] == target_student].copy()
-        numeric_cols = ['Meta_Semanal', 'Segunda', 'Terca', 'Quarta', 'Quinta', 'Sexta', 'Sabado', 'Domingo']
-        for col in numeric_cols:
-            df_user[col] = pd.to_numeric(df_user[col], errors='coerce').fillna(0).astype(int)
+        with span("shape"):
+            df_user = df[df['Username'] == target_student].copy()
             
     except Exception as e:
         st.error(f"Erro ao processar dados: {e}")
@@ -148,35 +175,17 @@ def load_view():
         
         if st.button("Salvar Alteracoes", use_container_width=True):
             try:
-                all_values = ws_diario.get_all_values()
-                sheet_headers = [h.strip() for h in all_values[0]]
-                col_indices = {name: i for i, name in enumerate(sheet_headers)}
-                
-                cells_to_update = []
-                
-                row_map = {}
-                for i, r in enumerate(all_values):
-                    if i == 0: continue
-                    u = r[col_indices['Username']] if len(r) > col_indices['Username'] else ""
-                    m = r[col_indices['Materia']] if len(r) > col_indices['Materia'] else ""
-                    row_map[(u, m)] = i + 1
-
-                for idx, row in edited_df.iterrows():
-                    key = (target_student, row['Materia'])
-                    row_idx = row_map.get(key)
-                    
-                    if row_idx:
-                        cols_to_check = ['Meta_Semanal', 'Segunda', 'Terca', 'Quarta', 'Quinta', 'Sexta', 'Sabado', 'Domingo']
-                        for col_name in cols_to_check:
-                            val_new = str(row[col_name])
-                            col_idx = col_indices[col_name] + 1
-                            cells_to_update.append(gspread.Cell(row_idx, col_idx, val_new))
+                # So as celulas que mudaram no editor
+                cols_to_check = ['Meta_Semanal', 'Segunda', 'Terca', 'Quarta', 'Quinta', 'Sexta', 'Sabado', 'Domingo']
+                with batch():
+                    cells_to_update = diff_cells("QUESTOES_DIARIAS", df_user, edited_df, cols_to_check)
+                    if cells_to_update:
+                        update_cells("QUESTOES_DIARIAS", cells_to_update)
+                        refresh_aggregates(target_student, "questoes")
                             
                 if cells_to_update:
-                    ws_diario.update_cells(cells_to_update)
-                    st.success("Dados salvos com sucesso!")
-                    sleep(1)
-                    st.rerun()
+                    notify("Dados salvos com sucesso!")
+                    rerun_fragment()
                 else:
                     st.warning("Nenhuma alteracao detectada.")
             except Exception as e:
@@ -193,71 +202,19 @@ def load_view():
         if not df_chart.empty:
             df_melt = df_chart.melt(id_vars=['Materia'], value_vars=['Total_Realizado', 'Meta_Semanal'], var_name='Tipo', value_name='Qtd')
             
-            fig = px.bar(
-                df_melt, 
-                x='Materia', 
-                y='Qtd', 
-                color='Tipo', 
-                barmode='group',
-                color_discrete_map={'Total_Realizado': '#10B981', 'Meta_Semanal': '#064E3B'},
-                text_auto=True
-            )
-            
-            fig.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color='#ECFDF5',
-                xaxis_title=None,
-                yaxis_title=None,
-                legend_title=None,
-                margin=dict(l=0, r=0, t=0, b=0)
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(cached_figure("questoes_semana", df_melt, weekly_chart), use_container_width=True)
         else:
             st.info("Sem dados suficientes para gerar grafico.")
         
         st.markdown("---")
         if st.button("FECHAR SEMANA E ARQUIVAR", type="primary", use_container_width=True):
             try:
-                week_label = datetime.now().strftime("Semana %d/%m/%Y")
-                
-                history_rows = []
-                cells_to_reset = []
-                
-                all_values = ws_diario.get_all_values()
-                sheet_headers = [h.strip() for h in all_values[0]]
-                col_indices = {name: i for i, name in enumerate(sheet_headers)}
-                
-                row_map = {}
-                for i, r in enumerate(all_values):
-                    if i == 0: continue
-                    u = r[col_indices['Username']] if len(r) > col_indices['Username'] else ""
-                    m = r[col_indices['Materia']] if len(r) > col_indices['Materia'] else ""
-                    row_map[(u, m)] = i + 1
-
-                days_cols = ['Segunda', 'Terca', 'Quarta', 'Quinta', 'Sexta', 'Sabado', 'Domingo']
-                
-                for idx, row in df_user.iterrows():
-                    materia = row['Materia']
-                    total_mat = row[days_cols].sum()
-                    
-                    if total_mat > 0:
-                        history_rows.append([target_student, week_label, materia, int(total_mat)])
-                    
-                    row_idx = row_map.get((target_student, materia))
-                    if row_idx:
-                        for day in days_cols:
-                            col_idx = col_indices[day] + 1
-                            cells_to_reset.append(gspread.Cell(row_idx, col_idx, 0))
-                
-                if history_rows:
-                    ws_hist.append_rows(history_rows)
-                
-                if cells_to_reset:
-                    ws_diario.update_cells(cells_to_reset)
-                    st.success("Semana encerrada! Historico salvo e dias zerados.")
-                    sleep(1.5)
-                    st.rerun()
+                result = close_week(week_label(), [target_student])
+                if result['closed']:
+                    notify("Semana encerrada! Historico salvo e dias zerados.")
+                    rerun_fragment()
+                elif result['skipped']:
+                    st.warning(f"A {result['label']} ja foi arquivada para este aluno.")
                 else:
                     st.warning("Nenhuma questao realizada para arquivar.")
                     
@@ -266,23 +223,16 @@ def load_view():
 
     with tab_historico:
         try:
-            hist_raw = ws_hist.get_all_values()
-            
-            if not hist_raw:
+            if len(df_hist.columns) == 0:
                 st.info("A tabela de historico esta vazia.")
             else:
-                headers_hist = hist_raw[0]
-                if len(hist_raw) < 2:
+                if df_hist.empty:
                     st.info("Nenhum historico arquivado ainda.")
                 else:
-                    df_hist = pd.DataFrame(hist_raw[1:], columns=headers_hist)
-                    
                     if 'Username' in df_hist.columns:
                         df_hist_user = df_hist[df_hist['Username'] == target_student].copy()
                         
                         if not df_hist_user.empty:
-                            df_hist_user['Qtd'] = pd.to_numeric(df_hist_user['Qtd'], errors='coerce').fillna(0).astype(int)
-                            
                             total_geral = df_hist_user['Qtd'].sum()
                             semanas_unicas = df_hist_user['Semana'].nunique()
                             media_semanal = int(total_geral / semanas_unicas) if semanas_unicas > 0 else 0
@@ -290,7 +240,7 @@ def load_view():
                             semana_top = df_hist_user.groupby('Semana')['Qtd'].sum().sort_values(ascending=False)
                             melhor_semana_val = semana_top.values[0] if not semana_top.empty else 0
                             
-                            materia_top = df_hist_user.groupby('Materia')['Qtd'].sum().sort_values(ascending=False)
+                            materia_top = df_hist_user.groupby('Materia', observed=True)['Qtd'].sum().sort_values(ascending=False)
                             materia_nome = materia_top.index[0] if not materia_top.empty else "-"
                             materia_val = materia_top.values[0] if not materia_top.empty else 0
                             
@@ -356,24 +306,7 @@ def load_view():
                             
                             st.write("")
                             st.markdown("### Evolucao por Semana")
-                            fig_hist = px.bar(
-                                df_hist_user,
-                                x="Semana",
-                                y="Qtd",
-                                color="Materia",
-                                barmode="group",
-                                color_discrete_sequence=px.colors.qualitative.Pastel,
-                                text_auto=True
-                            )
-                            fig_hist.update_layout(
-                                paper_bgcolor='rgba(0,0,0,0)',
-                                plot_bgcolor='rgba(0,0,0,0)',
-                                font_color='#ECFDF5',
-                                xaxis_title=None,
-                                yaxis_title=None,
-                                legend_title=None
-                            )
-                            st.plotly_chart(fig_hist, use_container_width=True)
+                            st.plotly_chart(cached_figure("questoes_historico", df_hist_user[['Semana', 'Materia', 'Qtd']], history_chart), use_container_width=True)
                             
                             with st.expander("Ver Tabela Detalhada"):
                                 st.dataframe(df_hist_user[['Semana', 'Materia', 'Qtd']], use_container_width=True, hide_index=True)
@@ -1,46 +1,38 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from time import sleep
-from google.oauth2.service_account import Credentials
-
-@st.cache_data(ttl=600)
-def connect_to_sheets():
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    credentials = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]),
-        scopes=scopes
-    )
-    client = gspread.authorize(credentials)
-    return client.open("Semear Mentoria")
+from notifications import notify, show_notifications, rerun_fragment
+from database import read_table, append_row, update_record, delete_record, batch
+from aggregates import refresh_aggregates
 
 def load_view():
     st.markdown("<h2 style='color: #10B981;'>Minhas Redações</h2>", unsafe_allow_html=True)
     
-    if 'edit_redacao_idx' not in st.session_state:
-        st.session_state['edit_redacao_idx'] = -1
+    if 'edit_redacao_id' not in st.session_state:
+        st.session_state['edit_redacao_id'] = -1
     if 'edit_redacao_data' not in st.session_state:
         st.session_state['edit_redacao_data'] = {}
 
     username = st.session_state['username']
+
+    render_redacoes(username)
+
+@st.fragment
+def render_redacoes(username):
+    show_notifications()
     
     try:
-        sh = connect_to_sheets()
-        worksheet = sh.worksheet("REDACOES")
-        data = worksheet.get_all_records()
-        df = pd.DataFrame(data)
+        df = read_table("REDACOES")
     except Exception as e:
         st.error(f"Erro ao carregar dados: {e}")
         return
 
     if not df.empty:
-        df['original_idx'] = df.index
         df_user = df[df['Username'] == username].copy()
     else:
         df_user = pd.DataFrame()
 
     with st.expander("Gerenciar Redação (Adicionar / Editar)", expanded=True):
-        is_edit = st.session_state['edit_redacao_idx'] != -1
+        is_edit = st.session_state['edit_redacao_id'] != -1
         form_title = "Editar Redação" if is_edit else "Nova Redação"
         st.markdown(f"#### {form_title}")
         
@@ -70,32 +62,36 @@ def load_view():
             if submitted:
                 nota_final = c1 + c2 + c3 + c4 + c5
                 
-                if is_edit:
-                    row_idx = st.session_state['edit_redacao_idx']
-                    worksheet.update_cell(row_idx + 2, 2, tema)
-                    worksheet.update_cell(row_idx + 2, 3, c1)
-                    worksheet.update_cell(row_idx + 2, 4, c2)
-                    worksheet.update_cell(row_idx + 2, 5, c3)
-                    worksheet.update_cell(row_idx + 2, 6, c4)
-                    worksheet.update_cell(row_idx + 2, 7, c5)
-                    worksheet.update_cell(row_idx + 2, 8, nota_final)
+                saved = True
+                with batch():
+                    if is_edit:
+                        record_id = st.session_state['edit_redacao_id']
+                        saved = update_record("REDACOES", (username, record_id), {
+                            'Tema': tema, 'C1': c1, 'C2': c2, 'C3': c3, 'C4': c4, 'C5': c5, 'Nota_Final': nota_final
+                        })
                     
-                    st.success("Redação atualizada!")
-                    st.session_state['edit_redacao_idx'] = -1
-                    st.session_state['edit_redacao_data'] = {}
-                else:
-                    new_row = [username, tema, c1, c2, c3, c4, c5, nota_final]
-                    worksheet.append_row(new_row)
-                    st.success("Redação salva!")
+                        if saved:
+                            notify("Redação atualizada!")
+                            st.session_state['edit_redacao_id'] = -1
+                            st.session_state['edit_redacao_data'] = {}
+                    else:
+                        new_row = [username, tema, c1, c2, c3, c4, c5, nota_final]
+                        append_row("REDACOES", new_row)
+                        notify("Redação salva!")
+                
+                    if saved:
+                        refresh_aggregates(username, "redacoes")
                 
-                sleep(1)
-                st.rerun()
+                if saved:
+                    rerun_fragment()
+                else:
+                    st.error("Erro ao encontrar o registro original.")
 
     if is_edit:
         if st.button("Cancelar Edição"):
-            st.session_state['edit_redacao_idx'] = -1
+            st.session_state['edit_redacao_id'] = -1
             st.session_state['edit_redacao_data'] = {}
-            st.rerun()
+            rerun_fragment()
 
     st.markdown("---")
 
@@ -103,7 +99,7 @@ def load_view():
         st.info("Nenhuma redação cadastrada.")
     else:
         for index, row in df_user.iterrows():
-            original_idx = row['original_idx']
+            record_id = row['ID']
             
             st.markdown(f"""
             <div style="background-color: #064E3B; padding: 20px; border-radius: 12px; border-left: 5px solid #10B981; margin-bottom: 20px;">
@@ -140,16 +136,17 @@ def load_view():
             
             c_edit, c_del = st.columns([3, 1])
             with c_edit:
-                if st.button("Editar", key=f"edit_red_{original_idx}", use_container_width=True):
-                    st.session_state['edit_redacao_idx'] = original_idx
+                if st.button("Editar", key=f"edit_red_{record_id}", use_container_width=True):
+                    st.session_state['edit_redacao_id'] = record_id
                     st.session_state['edit_redacao_data'] = row.to_dict()
-                    st.rerun()
+                    rerun_fragment()
             with c_del:
-                if st.button("Excluir", key=f"del_red_{original_idx}", use_container_width=True):
+                if st.button("Excluir", key=f"del_red_{record_id}", use_container_width=True):
                     try:
-                        worksheet.delete_rows(int(original_idx) + 2)
-                        st.success("Excluído!")
-                        sleep(1)
-                        st.rerun()
+                        with batch():
+                            delete_record("REDACOES", (username, record_id))
+                            refresh_aggregates(username, "redacoes")
+                        notify("Excluído!")
+                        rerun_fragment()
                     except Exception as e:
                         st.error(f"Erro: {e}")
@@ -1,23 +1,13 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from time import sleep
-
-def connect_to_sheets():
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    credentials = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]),
-        scopes=scopes
-    )
-    client = gspread.authorize(credentials)
-    return client.open("Semear Mentoria")
+from notifications import notify, show_notifications, rerun_fragment
+from database import read_table, append_row, update_record, delete_record
 
 def load_view():
     st.markdown("<h2 style='color: #10B981;'>Controle de Revisoes</h2>", unsafe_allow_html=True)
     
-    if 'edit_rev_idx' not in st.session_state:
-        st.session_state['edit_rev_idx'] = -1
+    if 'edit_rev_id' not in st.session_state:
+        st.session_state['edit_rev_id'] = -1
     if 'edit_rev_data' not in st.session_state:
         st.session_state['edit_rev_data'] = {}
 
@@ -26,19 +16,21 @@ def load_view():
         st.warning("Selecione um aluno no menu lateral.")
         return
 
+    render_revisoes(target_student)
+
+# Cada clique em Editar/Excluir reexecuta so este fragmento
+@st.fragment
+def render_revisoes(target_student):
+    show_notifications()
+
     try:
-        sh = connect_to_sheets()
-        worksheet = sh.worksheet("REVISOES")
-        
-        data = worksheet.get_all_records()
+        df = read_table("REVISOES")
         
-        expected_cols = ['Username', 'Data', 'Tipo_Revisao', 'Materia', 'Qtd_Questoes']
+        expected_cols = ['Username', 'Data', 'Tipo_Revisao', 'Materia', 'Qtd_Questoes', 'ID']
         
-        if not data:
+        if df.empty:
             df = pd.DataFrame(columns=expected_cols)
         else:
-            df = pd.DataFrame(data)
-            
             missing = [c for c in expected_cols if c not in df.columns]
             if missing:
                 for c in missing:
@@ -48,17 +40,15 @@ def load_view():
         st.error(f"Erro ao carregar dados: {e}")
         return
 
-    df['original_idx'] = df.index
-    
     if 'Username' in df.columns:
         df_user = df[df['Username'] == target_student].copy()
     else:
-        df_user = pd.DataFrame(columns=expected_cols + ['original_idx'])
+        df_user = pd.DataFrame(columns=expected_cols)
 
     
 
     with st.expander("Lancar Nova Revisao / Editar", expanded=True):
-        is_edit = st.session_state['edit_rev_idx'] != -1
+        is_edit = st.session_state['edit_rev_id'] != -1
         form_title = "Editar Lancamento" if is_edit else "Nova Revisao"
         st.markdown(f"#### {form_title}")
         
@@ -106,28 +96,33 @@ def load_view():
             submitted = st.form_submit_button(submit_label, use_container_width=True)
             
             if submitted:
+                data_str = data_rev.strftime("%d/%m/%Y")
+                
+                saved = True
                 if is_edit:
-                    row_idx = st.session_state['edit_rev_idx']
-                    worksheet.update_cell(row_idx + 2, 2, data_rev)
-                    worksheet.update_cell(row_idx + 2, 3, tipo)
-                    worksheet.update_cell(row_idx + 2, 4, materia)
-                    worksheet.update_cell(row_idx + 2, 5, qtd)
-                    st.success("Atualizado com sucesso!")
-                    st.session_state['edit_rev_idx'] = -1
-                    st.session_state['edit_rev_data'] = {}
+                    record_id = st.session_state['edit_rev_id']
+                    saved = update_record("REVISOES", (target_student, record_id), {
+                        'Data': data_str, 'Tipo_Revisao': tipo, 'Materia': materia, 'Qtd_Questoes': qtd
+                    })
+                    if saved:
+                        notify("Atualizado com sucesso!")
+                        st.session_state['edit_rev_id'] = -1
+                        st.session_state['edit_rev_data'] = {}
                 else:
-                    new_row = [target_student, data_rev, tipo, materia, qtd]
-                    worksheet.append_row(new_row)
-                    st.success("Salvo com sucesso!")
+                    new_row = [target_student, data_str, tipo, materia, qtd]
+                    append_row("REVISOES", new_row)
+                    notify("Salvo com sucesso!")
                 
-                sleep(0.5)
-                st.rerun()
+                if saved:
+                    rerun_fragment()
+                else:
+                    st.error("Erro ao encontrar o registro original.")
 
     if is_edit:
         if st.button("Cancelar Edicao"):
-            st.session_state['edit_rev_idx'] = -1
+            st.session_state['edit_rev_id'] = -1
             st.session_state['edit_rev_data'] = {}
-            st.rerun()
+            rerun_fragment()
 
     st.markdown("---")
 
@@ -151,7 +146,7 @@ def load_view():
                 st.info(f"Nenhuma revisao {tipo_nome} registrada para {target_student}.")
             else:
                 for index, row in filtered_df.iterrows():
-                    original_idx = row['original_idx']
+                    record_id = row['ID']
                     
                     st.markdown(f"""
                     <div style="
@@ -179,16 +174,15 @@ def load_view():
                     
                     c1, c2 = st.columns([3, 1])
                     with c1:
-                        if st.button("Editar", key=f"ed_{original_idx}", use_container_width=True):
-                            st.session_state['edit_rev_idx'] = original_idx
+                        if st.button("Editar", key=f"ed_{record_id}", use_container_width=True):
+                            st.session_state['edit_rev_id'] = record_id
                             st.session_state['edit_rev_data'] = row.to_dict()
-                            st.rerun()
+                            rerun_fragment()
                     with c2:
-                        if st.button("Excluir", key=f"del_{original_idx}", use_container_width=True):
+                        if st.button("Excluir", key=f"del_{record_id}", use_container_width=True):
                             try:
-                                worksheet.delete_rows(int(original_idx) + 2)
-                                st.success("Excluido!")
-                                sleep(0.5)
-                                st.rerun()
+                                delete_record("REVISOES", (target_student, record_id))
+                                notify("Excluido!")
+                                rerun_fragment()
                             except Exception as e:
                                 st.error(f"Erro: {e}")
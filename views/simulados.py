@@ -1,21 +1,50 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from time import sleep
+from notifications import notify, show_notifications, rerun_fragment
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime
+from database import read_table, append_row, update_record, delete_record, batch
+from aggregates import refresh_aggregates
+from charts import cached_figure
+from instrumentation import span
 
-def connect_to_sheets():
-    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-    credentials = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]),
-        scopes=scopes
+def evolution_chart(df_chart):
+    fig = go.Figure()
+
+    fig.add_trace(
+        go.Scatter(x=df_chart['Data'], y=df_chart['Total'], name="Total Acertos", 
+                  text=df_chart['Total'], textposition="top center", line=dict(color='#10B981', width=4), mode='lines+markers+text')
+    )
+
+    fig.add_trace(
+        go.Scatter(x=df_chart['Data'], y=df_chart['Redacao'], name="Redação", text=df_chart['Redacao'], textposition="top center",
+                  line=dict(color='#6EE7B7', width=3, dash='dot'), mode='lines+markers+text')
+    )
+
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font_color='#ECFDF5',
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.1)', title="Pontos / Acertos"),
+        margin=dict(l=20, r=20, t=20, b=20),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+def area_chart(df_area):
+    fig = px.bar(df_area, x='Area', y='Acertos', color='Acertos', color_continuous_scale='greens')
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font_color='#ECFDF5',
+        coloraxis_showscale=False,
+        margin=dict(l=20, r=20, t=20, b=20)
     )
-    client = gspread.authorize(credentials)
-    return client.open("Semear Mentoria")
+    fig.update_traces(text=df_area['Acertos'], textposition='outside')
+    return fig
 
 def load_view():
     st.markdown("<h2 style='color: #10B981;'>Controle de Simulados</h2>", unsafe_allow_html=True)
@@ -25,25 +54,26 @@ def load_view():
         st.warning("Selecione um aluno no menu lateral.")
         return
 
+    render_simulados(target_student)
+
+# Fragmento: Editar/Excluir nao reexecutam main.py nem releem a planilha
+@st.fragment
+def render_simulados(target_student):
+    show_notifications()
+
     if 'edit_sim_idx' not in st.session_state:
         st.session_state['edit_sim_idx'] = -1
     if 'edit_sim_data' not in st.session_state:
         st.session_state['edit_sim_data'] = {}
 
     try:
-        sh = connect_to_sheets()
-        worksheet = sh.worksheet("SIMULADOS")
-        
-        raw_data = worksheet.get_all_values()
         cols = ['Username', 'Nome_Simulado', 'Data', 'Linguagens', 'Humanas', 'Natureza', 'Matematica', 'Redacao', 'Total']
+        df = read_table("SIMULADOS")
         
-        if not raw_data:
+        if df.empty and len(df.columns) == 0:
             df = pd.DataFrame(columns=cols)
-            worksheet.append_row(cols)
+            append_row("SIMULADOS", cols)
         else:
-            headers = [h.strip() for h in raw_data[0]]
-            df = pd.DataFrame(raw_data[1:], columns=headers)
-            
             for c in cols:
                 if c not in df.columns:
                     df[c] = ""
@@ -52,8 +82,8 @@ def load_view():
         st.error(f"Erro ao carregar dados: {e}")
         return
 
-    df['original_idx'] = df.index
-    df_user = df[df['Username'] == target_student].copy()
+    with span("shape"):
+        df_user = df[df['Username'] == target_student].copy()
 
     with st.expander("Lançar Novo Simulado / Editar", expanded=True):
         is_edit = st.session_state['edit_sim_idx'] != -1
@@ -101,37 +131,33 @@ def load_view():
                 data_str = data_sim.strftime("%d/%m/%Y")
                 
                 try:
-                    all_values = worksheet.get_all_values()
-                    
-                    if is_edit:
-                        target_row_idx = -1
-                        old_name = edit_data.get('Nome_Simulado')
-                        
-                        header = all_values[0]
-                        idx_user = header.index('Username')
-                        idx_nome = header.index('Nome_Simulado')
+                    saved = True
+                    with batch():
+                        if is_edit:
+                            record_id = edit_data.get('ID')
+                            changes = {
+                                'Nome_Simulado': st.session_state.input_nome, 'Data': data_str,
+                                'Linguagens': ling, 'Humanas': hum, 'Natureza': nat, 'Matematica': mat,
+                                'Redacao': red, 'Total': total_acertos
+                            }
                         
-                        for i, row in enumerate(all_values):
-                            if i == 0: continue
-                            if row[idx_user] == target_student and row[idx_nome] == old_name:
-                                target_row_idx = i + 1
-                                break
-                        
-                        if target_row_idx != -1:
-                            worksheet.update_row(target_row_idx, [target_student, st.session_state.input_nome, data_str, ling, hum, nat, mat, red, total_acertos])
-                            st.success("Simulado atualizado!")
-                        else:
-                            st.error("Erro ao encontrar o registro original.")
+                            saved = update_record("SIMULADOS", (target_student, record_id), changes)
+                            if saved:
+                                notify("Simulado atualizado!")
                             
-                    else:
-                        new_row = [target_student, st.session_state.input_nome, data_str, ling, hum, nat, mat, red, total_acertos]
-                        worksheet.append_row(new_row)
-                        st.success("Simulado salvo!")
+                        else:
+                            new_row = [target_student, st.session_state.input_nome, data_str, ling, hum, nat, mat, red, total_acertos]
+                            append_row("SIMULADOS", new_row)
+                            notify("Simulado salvo!")
+                        if saved:
+                            refresh_aggregates(target_student, "simulados")
                     
-                    st.session_state['edit_sim_idx'] = -1
-                    st.session_state['edit_sim_data'] = {}
-                    sleep(1)
-                    st.rerun()
+                    if saved:
+                        st.session_state['edit_sim_idx'] = -1
+                        st.session_state['edit_sim_data'] = {}
+                        rerun_fragment()
+                    else:
+                        st.error("Erro ao encontrar o registro original.")
                     
                 except Exception as e:
                     st.error(f"Erro ao salvar: {e}")
@@ -140,7 +166,7 @@ def load_view():
         if st.button("Cancelar Edição"):
             st.session_state['edit_sim_idx'] = -1
             st.session_state['edit_sim_data'] = {}
-            st.rerun()
+            rerun_fragment()
 
     st.markdown("---")
 
@@ -185,26 +211,15 @@ def load_view():
                     if st.button("Editar", key=f"ed_{index}", use_container_width=True):
                         st.session_state['edit_sim_idx'] = index
                         st.session_state['edit_sim_data'] = row.to_dict()
-                        st.rerun()
+                        rerun_fragment()
                 with c2:
                     if st.button("Excluir", key=f"del_{index}", use_container_width=True):
                         try:
-                            all_vals = worksheet.get_all_values()
-                            header = all_vals[0]
-                            idx_u = header.index('Username')
-                            idx_n = header.index('Nome_Simulado')
-                            
-                            row_del = -1
-                            for i, r in enumerate(all_vals):
-                                if r[idx_u] == target_student and r[idx_n] == row['Nome_Simulado']:
-                                    row_del = i + 1
-                                    break
-                            
-                            if row_del != -1:
-                                worksheet.delete_rows(row_del)
-                                st.success("Excluido!")
-                                sleep(0.5)
-                                st.rerun()
+                            with batch():
+                                delete_record("SIMULADOS", (target_student, row['ID']))
+                                refresh_aggregates(target_student, "simulados")
+                            notify("Excluido!")
+                            rerun_fragment()
                         except Exception as e:
                             st.error(f"Erro: {e}")
 
@@ -212,33 +227,8 @@ def load_view():
         st.markdown("### Evolução")
         if not df_user.empty:
             df_chart = df_user.sort_values(by='Data_Sort')
-            
-            df_chart['Total'] = pd.to_numeric(df_chart['Total'], errors='coerce')
-            df_chart['Redacao'] = pd.to_numeric(df_chart['Redacao'], errors='coerce')
-
-            fig = go.Figure()
 
-            fig.add_trace(
-                go.Scatter(x=df_chart['Data'], y=df_chart['Total'], name="Total Acertos", 
-                          text=df_chart['Total'], textposition="top center", line=dict(color='#10B981', width=4), mode='lines+markers+text')
-            )
-
-            fig.add_trace(
-                go.Scatter(x=df_chart['Data'], y=df_chart['Redacao'], name="Redação", text=df_chart['Redacao'], textposition="top center",
-                          line=dict(color='#6EE7B7', width=3, dash='dot'), mode='lines+markers+text')
-            )
-
-            fig.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color='#ECFDF5',
-                xaxis=dict(showgrid=False),
-                yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.1)', title="Pontos / Acertos"),
-                margin=dict(l=20, r=20, t=20, b=20),
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(cached_figure("simulados_evolucao", df_chart[['Data', 'Total', 'Redacao']], evolution_chart), use_container_width=True)
             
             last_sim = df_chart.iloc[-1]
             areas = {'Linguagens': last_sim['Linguagens'], 'Humanas': last_sim['Humanas'], 
@@ -251,15 +241,6 @@ def load_view():
             
             df_area = pd.DataFrame(list(areas_clean.items()), columns=['Area', 'Acertos'])
             
-            fig2 = px.bar(df_area, x='Area', y='Acertos', color='Acertos', color_continuous_scale='greens')
-            fig2.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color='#ECFDF5',
-                coloraxis_showscale=False,
-                margin=dict(l=20, r=20, t=20, b=20)
-            )
-            fig2.update_traces(text=df_area['Acertos'], textposition='outside')
-            st.plotly_chart(fig2, use_container_width=True)
+            st.plotly_chart(cached_figure("simulados_areas", df_area, area_chart), use_container_width=True)
         else:
             st.info("Sem dados para gerar graficos.")
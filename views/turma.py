@@ -0,0 +1,67 @@
+import streamlit as st
+from database import fetch_snapshot, get_version
+from aggregates import compute_cohort, COHORT_SHEETS
+from auth import list_students
+from instrumentation import span
+
+COLUMNS = ['Username', 'Questoes', 'Semana', 'Meta', 'Progresso_Meta', 'Simulados', 'Media_Simulados',
+           'Redacoes', 'Media_Redacao', 'Taxa_Acerto', 'Estudados', 'Cobertura']
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_cohort(versions, students, _tables):
+    # Recalcula so quando alguma das abas (ou a lista de alunos) muda
+    return compute_cohort(_tables, list(students))
+
+def column_config():
+    return {
+        "Username": st.column_config.TextColumn("Aluno"),
+        "Questoes": st.column_config.NumberColumn("Questoes", format="%d"),
+        "Semana": st.column_config.NumberColumn("Semana", format="%d"),
+        "Meta": st.column_config.NumberColumn("Meta", format="%d"),
+        "Progresso_Meta": st.column_config.ProgressColumn("Meta Semanal", format="%.0f%%", min_value=0, max_value=100),
+        "Simulados": st.column_config.NumberColumn("Simulados", format="%d"),
+        "Media_Simulados": st.column_config.NumberColumn("Media Simulados", format="%.1f"),
+        "Redacoes": st.column_config.NumberColumn("Redacoes", format="%d"),
+        "Media_Redacao": st.column_config.NumberColumn("Media Redacao", format="%.0f"),
+        "Taxa_Acerto": st.column_config.NumberColumn("Taxa de Acerto", format="%.1f%%"),
+        "Estudados": st.column_config.NumberColumn("Topicos Estudados", format="%d"),
+        "Cobertura": st.column_config.ProgressColumn("Cobertura", format="%.0f%%", min_value=0, max_value=100),
+    }
+
+def load_view():
+    st.markdown("<h2 style='color: #10B981;'>Visao da Turma</h2>", unsafe_allow_html=True)
+
+    if st.session_state.get('role') != 'Mentor':
+        st.warning("Disponivel apenas para mentores.")
+        return
+
+    students = list_students()
+    if not students:
+        st.info("Sem alunos cadastrados.")
+        return
+
+    try:
+        tables = fetch_snapshot(COHORT_SHEETS)
+    except Exception as e:
+        st.error(f"Erro ao carregar dados: {e}")
+        return
+
+    with span("shape"):
+        versions = tuple(get_version(name) for name in COHORT_SHEETS)
+        df = cached_cohort(versions, tuple(students), tables)
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Alunos", len(df))
+    c2.metric("Meta Semanal (media)", f"{df['Progresso_Meta'].mean():.0f}%")
+    c3.metric("Media Simulados", f"{df.loc[df['Simulados'] > 0, 'Media_Simulados'].mean():.1f}" if (df['Simulados'] > 0).any() else "-")
+    c4.metric("Media Redacao", f"{df.loc[df['Redacoes'] > 0, 'Media_Redacao'].mean():.0f}" if (df['Redacoes'] > 0).any() else "-")
+
+    st.markdown("---")
+    st.caption("Clique no titulo de uma coluna para ordenar.")
+    st.dataframe(
+        df[COLUMNS].sort_values('Progresso_Meta'),
+        column_config=column_config(),
+        hide_index=True,
+        use_container_width=True,
+        height=min(38 + 35 * len(df), 700),
+    )
@@ -0,0 +1,165 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import gspread
+import streamlit as st
+from streamlit import logger
+from storage import TABLES, DAYS
+from database import (fetch_snapshot, read_table, append_rows, update_cells, find_row, column_index, batch,
+                      wait_for_writes, pop_write_errors)
+from aggregates import AGGREGATES_SHEET, refresh_questoes
+from instrumentation import session_scope
+
+# Fechamento da semana de todos os alunos de uma vez: os totais de
+# QUESTOES_DIARIAS vao para QUESTOES_HISTORICO com o rotulo da semana e os dias
+# voltam a zero. Uma leitura em lote das abas e um unico lote de escrita com
+# historico, zeragem e agregados. Aluno que ja tem linhas com o rotulo no
+# historico e pulado, entao rodar de novo a mesma semana nao arquiva nada duas
+# vezes. As abas de questoes sao lidas do backend, nao do cache: a linha de
+# comando, o agendamento e o botao podem rodar em processos diferentes.
+
+WEEK_FORMAT = "Semana %d/%m/%Y"
+CLOSE_SHEETS = ["QUESTOES_DIARIAS", "QUESTOES_HISTORICO", AGGREGATES_SHEET]
+FRESH_SHEETS = ["QUESTOES_DIARIAS", "QUESTOES_HISTORICO"]
+WEEKDAYS = ['seg', 'ter', 'qua', 'qui', 'sex', 'sab', 'dom']
+SCHEDULER_SESSION = "fechamento-semanal"
+
+_log = logger.get_logger(__name__)
+
+
+def week_label(day=None):
+    return (day or datetime.now()).strftime(WEEK_FORMAT)
+
+def _load_tables(create=True):
+    tables = fetch_snapshot(CLOSE_SHEETS, fresh=FRESH_SHEETS)
+    for name in CLOSE_SHEETS:
+        if create and len(tables[name].columns) == 0:
+            # Aba ainda nao criada na planilha (a simulacao nao cria)
+            tables[name] = read_table(name, headers=TABLES[name])
+    return tables
+
+def close_week(label=None, students=None, dry_run=False):
+    # students=None fecha todos os alunos com linhas em QUESTOES_DIARIAS
+    label = label or week_label()
+    result = {'label': label, 'closed': [], 'skipped': [], 'empty': [], 'rows': 0, 'cells': 0}
+
+    with batch():
+        tables = _load_tables(create=not dry_run)
+        dia = tables["QUESTOES_DIARIAS"]
+        hist = tables["QUESTOES_HISTORICO"]
+        days = [d for d in DAYS if d in dia.columns]
+        if dia.empty or not days:
+            return result
+
+        archived = set()
+        if not hist.empty and 'Semana' in hist.columns:
+            archived = set(hist.loc[hist['Semana'] == label, 'Username'].astype(str))
+
+        if students is None:
+            students = sorted(dia['Username'].astype(str).unique())
+        wanted = set(students)
+        dia = dia[dia['Username'].astype(str).isin(wanted - archived)]
+        result['skipped'] = [s for s in students if s in archived]
+
+        history_rows = []
+        cells = []
+        columns = {day: column_index("QUESTOES_DIARIAS", day) for day in days}
+        for username, materia, *counts in dia[['Username', 'Materia'] + days].itertuples(index=False, name=None):
+            total = int(sum(counts))
+            if total > 0:
+                history_rows.append([username, label, materia, total])
+            row = find_row("QUESTOES_DIARIAS", (username, materia))
+            if row is None:
+                continue
+            cells += [gspread.Cell(row, columns[day], 0) for day, count in zip(days, counts) if count != 0]
+
+        touched = set(dia.loc[dia[days].ne(0).any(axis=1), 'Username'].astype(str))
+        result['closed'] = [s for s in students if s in touched]
+        result['empty'] = [s for s in students if s not in touched and s not in archived]
+        result['rows'] = len(history_rows)
+        result['cells'] = len(cells)
+
+        if dry_run or not result['closed']:
+            return result
+
+        append_rows("QUESTOES_HISTORICO", history_rows)
+        update_cells("QUESTOES_DIARIAS", cells)
+        refresh_questoes(result['closed'])
+    return result
+
+# AGENDAMENTO NO PROPRIO PROCESSO
+# SEMEAR_WEEKLY_CLOSE="dom 23:30" fecha a semana toda semana nesse dia e hora
+# (horario local do servidor). Sem a variavel, nada e agendado. Se o processo
+# estiver parado no horario a semana nao e fechada: para isso, use a linha de
+# comando num cron.
+
+def parse_schedule(text):
+    try:
+        day, clock = text.strip().lower().split()
+        at = datetime.strptime(clock, "%H:%M")
+        return WEEKDAYS.index(day[:3]), at.hour, at.minute
+    except ValueError:
+        return None
+
+def next_run(schedule, now=None):
+    weekday, hour, minute = schedule
+    now = now or datetime.now()
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(days=(weekday - now.weekday()) % 7)
+    return run if run > now else run + timedelta(days=7)
+
+def _run_schedule(schedule):
+    while True:
+        run = next_run(schedule)
+        while datetime.now() < run:
+            time.sleep(min(60, max(1, (run - datetime.now()).total_seconds())))
+        try:
+            with session_scope(SCHEDULER_SESSION):
+                result = close_week(week_label(run))
+                wait_for_writes()
+                errors = pop_write_errors()
+            for message in errors:
+                _log.error("Fechamento semanal: %s", message)
+            _log.info("Fechamento semanal %s: %d alunos, %d ja fechados", result['label'], len(result['closed']), len(result['skipped']))
+        except Exception:
+            _log.exception("Fechamento semanal falhou")
+
+@st.cache_resource
+def start_weekly_close():
+    text = os.environ.get("SEMEAR_WEEKLY_CLOSE")
+    schedule = parse_schedule(text) if text else None
+    if schedule is None:
+        return None
+    threading.Thread(target=_run_schedule, args=(schedule,), name="semear-weekly-close", daemon=True).start()
+    return schedule
+
+# LINHA DE COMANDO
+#   python weekly.py                      fecha a semana de hoje para todos
+#   python weekly.py --week 12/10/2026    rotulo de outra data
+#   python weekly.py --students ana --dry-run
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fecha a semana de questoes de todos os alunos")
+    parser.add_argument("--week", help="data do rotulo (DD/MM/AAAA); padrao: hoje")
+    parser.add_argument("--students", nargs="+", help="so estes alunos")
+    parser.add_argument("--dry-run", action="store_true", help="mostra o que seria arquivado, sem gravar")
+    args = parser.parse_args(argv)
+    logger.set_log_level("error")
+
+    label = week_label(datetime.strptime(args.week, "%d/%m/%Y")) if args.week else week_label()
+    result = close_week(label, args.students, dry_run=args.dry_run)
+    # A gravacao vai para a fila em segundo plano: espera antes de sair
+    wait_for_writes(timeout=None)
+    errors = pop_write_errors()
+
+    print(f"{result['label']}{' (simulacao)' if args.dry_run else ''}")
+    print(f"  fechados: {len(result['closed'])}  ja fechados: {len(result['skipped'])}  sem questoes: {len(result['empty'])}")
+    print(f"  linhas no historico: {result['rows']}  celulas zeradas: {result['cells']}")
+    for message in errors:
+        print(f"  ERRO: {message}", file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())